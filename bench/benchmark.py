@@ -0,0 +1,214 @@
+# benchmark.py
+"""
+Benchmark de las etapas del pipeline con datos sintéticos.
+
+Mide por separado (mediana de --repeticiones corridas):
+  - leer_movimientos_itau / leer_movimientos_brou, en frío (sin layouts
+    aprendidos) y en caliente (_caliente: con el layout ya recordado)
+  - _normalize_amount sobre montos con formato latino
+  - comparador.comparar
+  - exportación (exportador.exportar a .xlsx)
+
+y la memoria (deep, MB) de los DataFrames que produce cada etapa. Escribe un JSON comparable entre corridas.
+
+Uso (desde la raíz del repo):
+    python bench/benchmark.py --tamanos 1000 10000 100000 --salida bench_resultados.json
+    python bench/benchmark.py --tamanos 1000000 --repeticiones 1
+    python bench/benchmark.py --comparar-con bench_anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import columnar  # noqa: E402
+import sinteticos  # noqa: E402
+
+
+def _medir(funcion, repeticiones: int, preparar=None):
+    """Mediana de `repeticiones` llamadas. `preparar` corre antes de cada una, fuera del tiempo."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos), resultado
+
+
+def _registro(etapa: str, tamano: int, segundos: float, filas: int, df: pd.DataFrame | None = None) -> dict:
+    registro = {
+        "etapa": etapa,
+        "tamano": tamano,
+        "segundos": round(segundos, 4),
+        "filas": filas,
+        "filas_por_segundo": round(filas / segundos) if segundos > 0 else None,
+    }
+    if df is not None:
+        registro["memoria_mb"] = columnar.memoria_mb(df)
+    return registro
+
+
+def _commit_actual() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _olvidar_layouts():
+    """Vacía los layouts aprendidos de los lectores: cada lectura detecta el encabezado de cero."""
+    import lectorBrou
+    import lectorItau
+
+    for lector in (lectorItau, lectorBrou):
+        with lector._LOCK_LAYOUTS:
+            lector._LAYOUTS_APRENDIDOS.clear()
+
+
+def correr(tamanos, repeticiones: int, directorio: str, args) -> dict:
+    import comparador
+    import db
+    import exportador
+    import lectorBrou
+    import lectorItau
+
+    resultados = []
+    for n in tamanos:
+        print(f"▶ tamaño {n}", file=sys.stderr)
+        mov = sinteticos.generar_movimientos(n, semilla=args.semilla)
+        # semilla y formato de montos en el nombre: con --directorio solo se
+        # reutiliza un archivo generado con los mismos parámetros
+        sufijo = f"{n}_s{args.semilla}_t{args.montos_texto:g}"
+        ruta_itau = os.path.join(directorio, f"itau_{sufijo}.xlsx")
+        ruta_brou = os.path.join(directorio, f"brou_{sufijo}.xlsx")
+        if not os.path.exists(ruta_itau):
+            sinteticos.escribir_itau(mov, ruta_itau, montos_texto=args.montos_texto, semilla=args.semilla)
+        if not os.path.exists(ruta_brou):
+            sinteticos.escribir_brou(mov, ruta_brou, montos_texto=args.montos_texto, semilla=args.semilla)
+        mayor = sinteticos.generar_mayor(
+            mov,
+            tasa_duplicados=args.tasa_duplicados,
+            tasa_consolidacion=args.tasa_consolidacion,
+            semilla=args.semilla,
+        )
+        # misma proyección y tipos que devuelve db.obtener_df_bd
+        mayor = db._compactar(mayor[list(db.COLUMNAS_BD)].copy())
+
+        # en frío (detectando el encabezado en cada lectura) y en caliente
+        # (con el layout ya aprendido, como el servicio o el vigilante)
+        seg, df_itau = _medir(lambda: lectorItau.leer_movimientos_itau(ruta_itau), repeticiones, _olvidar_layouts)
+        resultados.append(_registro("leer_movimientos_itau", n, seg, len(df_itau), df_itau))
+        seg, _ = _medir(lambda: lectorItau.leer_movimientos_itau(ruta_itau), repeticiones)
+        resultados.append(_registro("leer_movimientos_itau_caliente", n, seg, len(df_itau)))
+
+        seg, df_brou = _medir(lambda: lectorBrou.leer_movimientos_brou(ruta_brou), repeticiones, _olvidar_layouts)
+        resultados.append(_registro("leer_movimientos_brou", n, seg, len(df_brou), df_brou))
+        seg, _ = _medir(lambda: lectorBrou.leer_movimientos_brou(ruta_brou), repeticiones)
+        resultados.append(_registro("leer_movimientos_brou_caliente", n, seg, len(df_brou)))
+
+        montos = pd.Series(sinteticos._latino(np.nan_to_num(mov["Débito"].to_numpy()) + 0.01), dtype=object)
+        seg, _ = _medir(lambda: lectorItau._normalize_amount(montos), repeticiones)
+        resultados.append(_registro("_normalize_amount", n, seg, len(montos)))
+
+        seg, resultado = _medir(lambda: comparador.comparar(df_itau, mayor), repeticiones)
+        registro = _registro("comparador.comparar", n, seg, len(resultado), resultado)
+        registro["filas_mayor"] = len(mayor)
+        registro["memoria_mayor_mb"] = columnar.memoria_mb(mayor)
+        registro["encontrados"] = int(resultado["Encontrado"].sum())
+        resultados.append(registro)
+
+        ruta_salida = os.path.join(directorio, f"resultado_{n}.xlsx")
+        seg, _ = _medir(lambda: exportador.exportar(resultado, ruta_salida), repeticiones)
+        resultados.append(_registro("exportar_xlsx", n, seg, len(resultado)))
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "parametros": {
+            "tamanos": list(tamanos),
+            "repeticiones": repeticiones,
+            "semilla": args.semilla,
+            "montos_texto": args.montos_texto,
+            "tasa_duplicados": args.tasa_duplicados,
+            "tasa_consolidacion": args.tasa_consolidacion,
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar_con(actual: dict, ruta_previa: str):
+    with open(ruta_previa, encoding="utf-8") as f:
+        previo = json.load(f)
+    base = {(r["etapa"], r["tamano"]): r["segundos"] for r in previo["resultados"]}
+    print(f"{'etapa':<30} {'tamaño':>9} {'antes':>9} {'ahora':>9} {'cambio':>8}")
+    for r in actual["resultados"]:
+        antes = base.get((r["etapa"], r["tamano"]))
+        if antes is None:
+            continue
+        cambio = (r["segundos"] - antes) / antes * 100 if antes else 0.0
+        print(f"{r['etapa']:<30} {r['tamano']:>9} {antes:>9.3f} {r['segundos']:>9.3f} {cambio:>+7.1f}%")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de conciliación con datos sintéticos.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Cantidad de movimientos por corrida (10^3 a 10^6).")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Corridas por etapa (se reporta la mediana).")
+    parser.add_argument("--salida", default="bench_resultados.json", help="Archivo JSON de resultados.")
+    parser.add_argument("--directorio", help="Dónde guardar/reutilizar los archivos generados (se reutilizan solo con el mismo tamaño, "
+                             "--semilla y --montos-texto; por defecto, uno temporal).")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--montos-texto", type=float, default=0.5,
+                        help="Fracción de montos escritos como texto latino ('1.234,56').")
+    parser.add_argument("--tasa-duplicados", type=float, default=0.02)
+    parser.add_argument("--tasa-consolidacion", type=float, default=0.05)
+    parser.add_argument("--comparar-con", help="JSON de una corrida anterior para mostrar diferencias.")
+    args = parser.parse_args(argv)
+
+    if args.directorio:
+        os.makedirs(args.directorio, exist_ok=True)
+        datos = correr(args.tamanos, args.repeticiones, args.directorio, args)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_conciliacion_") as directorio:
+            datos = correr(args.tamanos, args.repeticiones, directorio, args)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+
+    for r in datos["resultados"]:
+        memoria = f"{r['memoria_mb']:>9.2f} MB" if "memoria_mb" in r else ""
+        print(f"{r['etapa']:<30} {r['tamano']:>9} {r['segundos']:>9.3f} s {memoria}")
+    print(f"💾 Resultados en {args.salida}")
+
+    if args.comparar_con:
+        comparar_con(datos, args.comparar_con)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
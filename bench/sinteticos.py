@@ -0,0 +1,193 @@
+# sinteticos.py
+"""
+Generador de datos sintéticos para benchmarks:
+  - extractos con layout Itaú (preámbulo, encabezado de 2 filas, montos como
+    texto latino "1.234,56", pie "Saldo actual"/"Total");
+  - extractos con layout BROU (preámbulo, encabezado de una fila, pie);
+  - mayores con la forma de conciliacion.m_cpf_contaux, con tasas controladas
+    de duplicados, consolidaciones y movimientos faltantes.
+
+Todo es determinístico a partir de la semilla.
+"""
+import numpy as np
+import pandas as pd
+
+CONCEPTOS = [
+    "TRANSFERENCIA RECIBIDA", "TRANSFERENCIA ENVIADA", "PAGO PROVEEDOR",
+    "DEPOSITO EFECTIVO", "COMISION MANTENIMIENTO", "DEBITO AUTOMATICO UTE",
+    "DEBITO AUTOMATICO ANTEL", "COBRO TARJETA", "PAGO BPS", "PAGO DGI",
+    "CHEQUE DEPOSITADO", "INTERESES",
+]
+DEPENDENCIAS = ["CASA CENTRAL", "AGENCIA CORDON", "AGENCIA POCITOS", "AGENCIA PASO MOLINO"]
+
+
+def _latino(valores: np.ndarray) -> np.ndarray:
+    """1234.5 -> '1.234,50' (vectorizado con pandas)."""
+    texto = pd.Series(valores).map("{:,.2f}".format)
+    return texto.str.replace(",", "X", regex=False).str.replace(".", ",", regex=False).str.replace("X", ".", regex=False).to_numpy()
+
+
+def generar_movimientos(n: int, semilla: int = 42, desde: str = "2024-01-01", dias: int = 365) -> pd.DataFrame:
+    """Movimientos base (fecha, concepto, débito, crédito, saldo) ordenados por fecha."""
+    rng = np.random.default_rng(semilla)
+    fechas = np.sort(pd.Timestamp(desde).to_datetime64() + rng.integers(0, dias, n).astype("timedelta64[D]"))
+    es_credito = rng.random(n) < 0.45
+    # montos log-normales con muchos importes "redondos" repetidos, como en la realidad
+    montos = np.round(rng.lognormal(mean=8, sigma=1.5, size=n), 2)
+    redondos = rng.random(n) < 0.2
+    montos[redondos] = np.round(montos[redondos], -2) + 100
+
+    debito = np.where(es_credito, np.nan, montos)
+    credito = np.where(es_credito, montos, np.nan)
+    saldo = np.round(1_000_000 + np.cumsum(np.nan_to_num(credito) - np.nan_to_num(debito)), 2)
+
+    return pd.DataFrame({
+        "Fecha": fechas,
+        "Concepto": rng.choice(CONCEPTOS, n),
+        "Débito": debito,
+        "Crédito": credito,
+        "Saldo": saldo,
+        "Referencia": rng.integers(10_000_000, 99_999_999, n).astype(str),
+        "Destino": rng.choice(["", "CTA 1234567", "CTA 7654321", "OBS"], n),
+        "Dependencia": rng.choice(DEPENDENCIAS, n),
+    })
+
+
+def _escribir_filas(ruta: str, filas):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Movimientos")
+    for fila in filas:
+        ws.append(fila)
+    wb.save(ruta)
+
+
+def escribir_itau(mov: pd.DataFrame, ruta: str, montos_texto: float = 0.5, semilla: int = 42) -> str:
+    """
+    Escribe un .xlsx con layout Itaú. Una fracción `montos_texto` de los montos
+    se escribe como texto latino ("1.234,56"), el resto como número.
+    """
+    rng = np.random.default_rng(semilla)
+    n = len(mov)
+    fechas = pd.Series(mov["Fecha"]).dt.strftime("%d/%m/%Y").to_numpy()
+
+    def _columna(valores):
+        valores = np.asarray(valores, dtype=float)
+        como_texto = rng.random(n) < montos_texto
+        out = np.where(np.isnan(valores), None, valores).astype(object)
+        validos = ~np.isnan(valores) & como_texto
+        out[validos] = _latino(valores[validos])
+        return out
+
+    deb, cred, saldo = _columna(mov["Débito"]), _columna(mov["Crédito"]), _columna(mov["Saldo"])
+
+    def filas():
+        yield ["Banco Itaú Uruguay S.A."]
+        yield ["Estado de cuenta", "Cuenta corriente 2769087", "UYU"]
+        yield []
+        # encabezado de dos filas: nombres + unidad / subtítulo
+        yield ["Fecha", "Concepto", "Débito", "Crédito", "Saldo", "Referencia", "Destino"]
+        yield ["Operación", "", "(UYU)", "(UYU)", "(UYU)", "", ""]
+        for i in range(n):
+            yield [fechas[i], mov["Concepto"].iat[i], deb[i], cred[i], saldo[i],
+                   mov["Referencia"].iat[i], mov["Destino"].iat[i]]
+        yield []
+        yield ["Saldo actual", None, None, None, saldo[-1] if n else None]
+        yield ["Total débitos", None, _latino(np.array([np.nansum(mov["Débito"])]))[0]]
+
+    _escribir_filas(ruta, filas())
+    return ruta
+
+
+def escribir_brou(mov: pd.DataFrame, ruta: str, montos_texto: float = 0.5, semilla: int = 42) -> str:
+    """Escribe un .xlsx con layout BROU (encabezado de una fila)."""
+    rng = np.random.default_rng(semilla + 1)
+    n = len(mov)
+    fechas = pd.Series(mov["Fecha"]).dt.strftime("%d/%m/%Y").to_numpy()
+
+    def _columna(valores):
+        valores = np.asarray(valores, dtype=float)
+        como_texto = rng.random(n) < montos_texto
+        out = np.where(np.isnan(valores), None, valores).astype(object)
+        validos = ~np.isnan(valores) & como_texto
+        out[validos] = _latino(valores[validos])
+        return out
+
+    deb, cred = _columna(mov["Débito"]), _columna(mov["Crédito"])
+
+    def filas():
+        yield ["BANCO DE LA REPUBLICA ORIENTAL DEL URUGUAY"]
+        yield ["Detalle de movimientos de cuenta"]
+        yield []
+        yield ["Fecha", "Descripción", "Número de documento", "Asunto", "Dependencia", "Débito", "Crédito"]
+        for i in range(n):
+            yield [fechas[i], mov["Concepto"].iat[i], mov["Referencia"].iat[i], mov["Destino"].iat[i],
+                   mov["Dependencia"].iat[i], deb[i], cred[i]]
+        yield []
+        yield ["Saldo actual", None, None, None, None, None, None]
+
+    _escribir_filas(ruta, filas())
+    return ruta
+
+
+def generar_mayor(
+    mov: pd.DataFrame,
+    cod_tit: str = "113",
+    tasa_duplicados: float = 0.02,
+    tasa_consolidacion: float = 0.05,
+    tasa_faltantes: float = 0.03,
+    semilla: int = 42,
+) -> pd.DataFrame:
+    """
+    Mayor con la forma de m_cpf_contaux a partir de los movimientos del extracto:
+      - tasa_faltantes: movimientos del banco que no están en el mayor;
+      - tasa_consolidacion: movimientos que en el mayor están partidos en 2-3
+        asientos del mismo día (el banco los consolidó en una sola línea);
+      - tasa_duplicados: asientos repetidos (mismo día y monto, otro nro_trans).
+    """
+    rng = np.random.default_rng(semilla + 2)
+    n = len(mov)
+    monto = np.nan_to_num(mov["Crédito"].to_numpy()) - np.nan_to_num(mov["Débito"].to_numpy())
+    fecha = mov["Fecha"].to_numpy()
+
+    presentes = rng.random(n) >= tasa_faltantes
+    consolidados = presentes & (rng.random(n) < tasa_consolidacion)
+    simples = presentes & ~consolidados
+
+    fechas = [fecha[simples]]
+    montos = [monto[simples]]
+
+    # cada consolidado se parte en 2 o 3 asientos que suman el total
+    partes = rng.integers(2, 4, consolidados.sum())
+    fecha_c = np.repeat(fecha[consolidados], partes)
+    total_c = np.repeat(monto[consolidados], partes)
+    pesos = rng.random(len(total_c)) + 0.1
+    grupo = np.repeat(np.arange(len(partes)), partes)
+    suma_pesos = np.bincount(grupo, weights=pesos)[grupo]
+    monto_c = np.round(total_c * pesos / suma_pesos, 2)
+    fechas.append(fecha_c)
+    montos.append(monto_c)
+
+    fechas = np.concatenate(fechas)
+    montos = np.concatenate(montos)
+
+    dup = rng.random(len(montos)) < tasa_duplicados
+    fechas = np.concatenate([fechas, fechas[dup]])
+    montos = np.concatenate([montos, montos[dup]])
+
+    orden = rng.permutation(len(montos))
+    fechas, montos = fechas[orden], montos[orden]
+    m = len(montos)
+
+    return pd.DataFrame({
+        "nro_trans": np.arange(1, m + 1),
+        "fec_doc": fechas,
+        "imp_mov_mo": montos,
+        "imp_neto": montos,
+        "cod_aux": "bancos    ",
+        "cod_tit": cod_tit,
+        "conciliado": False,
+        "des_mov": rng.choice(CONCEPTOS, m),
+        "cod_mon": "UYU",
+    })
@@ -0,0 +1,72 @@
+# columnar.py
+"""
+Política de representación compacta para extractos y mayores.
+
+- Texto repetido (conceptos, dependencias, códigos) -> category.
+- Fechas -> datetime64 normalizado al día (pandas no admite datetime64[D];
+  se usa la unidad nativa con la hora en 00:00, 8 bytes por fila en vez de
+  un objeto date de Python).
+- Montos para comparar -> int64 en centavos (claves exactas, sin flotantes).
+"""
+import numpy as np
+import pandas as pd
+
+# si la proporción de valores distintos supera esto, category no ahorra memoria
+MAX_PROPORCION_CATEGORIA = 0.5
+
+# la clave (día, centavos) se empaqueta en un int64:
+#   dias_desde_1970 * 2**42 + (centavos + 2**41)
+# admite montos de hasta ±2**41 centavos (~2.2e10 unidades) y fechas hasta ~2500.
+_BITS_CENTAVOS = 42
+_DESPLAZAMIENTO = 1 << (_BITS_CENTAVOS - 1)
+
+
+def compactar_texto(df: pd.DataFrame, columnas=None) -> pd.DataFrame:
+    """
+    Convierte a category las columnas de texto repetitivas (in place sobre df,
+    que se devuelve por comodidad). Por defecto revisa todas las de texto.
+    """
+    if columnas is None:
+        columnas = [c for c in df.columns if df[c].dtype == object or pd.api.types.is_string_dtype(df[c].dtype)]
+    n = len(df)
+    for col in columnas:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        serie = df[col]
+        if not (serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype)):
+            continue
+        if n and serie.nunique(dropna=True) <= n * MAX_PROPORCION_CATEGORIA:
+            df[col] = serie.astype("category")
+    return df
+
+
+def a_dia(serie: pd.Series, dayfirst: bool = False) -> pd.Series:
+    """Fecha (texto, date, datetime) -> datetime64 normalizado al día."""
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        fechas = serie
+    else:
+        fechas = pd.to_datetime(serie, errors="coerce", dayfirst=dayfirst)
+    if getattr(fechas.dt, "tz", None) is not None:
+        fechas = fechas.dt.tz_localize(None)
+    return fechas.dt.normalize()
+
+
+def a_centavos(serie: pd.Series) -> pd.Series:
+    """Monto -> Int64 (nullable) en centavos, redondeando al centavo."""
+    montos = pd.to_numeric(serie, errors="coerce")
+    return (montos * 100).round().astype("Int64")
+
+
+def clave_dia_monto(fechas: pd.Series, centavos: pd.Series) -> np.ndarray:
+    """
+    Empaqueta (día, centavos) en un único int64 para cruzar con un índice
+    hash en vez de un merge de dos columnas. Las filas deben venir sin nulos.
+    """
+    dias = fechas.to_numpy(dtype="datetime64[D]").astype("int64")
+    cent = centavos.to_numpy(dtype="int64")
+    return (dias << _BITS_CENTAVOS) + (cent + _DESPLAZAMIENTO)
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    """Memoria real (deep) del DataFrame en MB."""
+    return round(df.memory_usage(deep=True).sum() / 2**20, 3)
@@ -1,19 +1,46 @@
 # comparador.py
+import hashlib
+import weakref
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 from typing import Tuple
 
+import columnar
+from instrumentacion import etapa
+
+
+# Columnas del extracto que no van al resultado (en minúsculas, sin depender
+# de acentos ni mayúsculas). Se descartan antes de filtrar para no copiarlas.
+_COLUMNAS_DESCARTADAS = {
+    "número de documento",
+    "numero de documento",
+    "asunto",
+    "dependencia",
+    "débito",
+    "debito",
+    "crédito",
+    "credito",
+    "saldo",
+    "referencia",
+    "destino",
+}
+
 
-def _normalizar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
+def _normalizar_excel(df_excel: pd.DataFrame, conservar=None) -> pd.DataFrame:
     """
     Prepara el DataFrame del Excel:
     - Detecta columnas de Fecha, Débito y Crédito.
     - Calcula Monto_Excel = Crédito - Débito.
     - Crea columnas normalizadas para comparación: Fecha_norm, Monto_norm.
-    """
-    df = df_excel.copy()
+    - Agrega _clave (día + centavos en un int64) para el cruce.
 
+    Solo se copian las filas válidas de las columnas `conservar`
+    (por defecto, todas); el DataFrame original no se toca.
+    """
     # Mapeo de nombres tolerante a acentos y mayúsculas
-    cols_lower = {c.lower(): c for c in df.columns}
+    cols_lower = {c.lower(): c for c in df_excel.columns}
 
     # Fecha
     fecha_col = None
@@ -41,22 +68,30 @@ def _normalizar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
         raise ValueError("No se encontraron columnas 'Débito' o 'Crédito' en el Excel.")
 
     # Cálculo de monto
-    deb = df[deb_col].fillna(0) if deb_col else 0
-    cred = df[cred_col].fillna(0) if cred_col else 0
-    df["Monto_Excel"] = (
-        pd.to_numeric(cred, errors="coerce").fillna(0)
-        - pd.to_numeric(deb, errors="coerce").fillna(0)
+    deb = pd.to_numeric(df_excel[deb_col], errors="coerce").fillna(0) if deb_col else 0
+    cred = pd.to_numeric(df_excel[cred_col], errors="coerce").fillna(0) if cred_col else 0
+    monto = pd.Series(cred - deb, index=df_excel.index, dtype="float64")
+    fecha = columnar.a_dia(df_excel[fecha_col])
+
+    # Filtrar filas válidas (una sola selección, solo de las columnas que quedan)
+    validas = fecha.notna() & monto.notna()
+    if conservar is None:
+        conservar = list(df_excel.columns)
+    conservar = [c for c in conservar if c != "Fecha"]
+    df = df_excel.loc[validas, conservar]
+
+    fecha = fecha[validas]
+    monto = monto[validas]
+    centavos = columnar.a_centavos(monto)
+
+    df = df.assign(
+        Fecha=fecha,
+        Monto_Excel=monto,
+        # Normalización interna para comparar
+        Fecha_norm=fecha,
+        Monto_norm=centavos.to_numpy(dtype="float64") / 100,
+        _clave=columnar.clave_dia_monto(fecha, centavos),
     )
-
-    df["Fecha"] = pd.to_datetime(df[fecha_col], errors="coerce").dt.date
-
-    # Normalización interna para comparar
-    df["Fecha_norm"] = df["Fecha"]
-    df["Monto_norm"] = df["Monto_Excel"].round(2)
-
-    # Filtrar filas válidas
-    df = df[df["Fecha_norm"].notna() & df["Monto_norm"].notna()]
-
     return df
 
 
@@ -66,27 +101,38 @@ def _normalizar_bd(df_bd: pd.DataFrame) -> pd.DataFrame:
     - Usa fec_doc como fecha.
     - Usa imp_mov_mo como monto.
     - Mantiene nro_trans.
-    - Crea columnas normalizadas para comparación:
-        Fecha_norm, Monto_norm, Fecha_BD, Monto_BD.
+    - Devuelve solo lo necesario para el cruce:
+        Fecha_BD, Monto_BD, nro_trans y _clave (día + centavos).
     """
     required_cols = {"fec_doc", "imp_mov_mo", "nro_trans"}
     faltantes = required_cols - set(df_bd.columns)
     if faltantes:
         raise ValueError(f"En el DataFrame de BD faltan columnas requeridas: {faltantes}")
 
-    df = df_bd.copy()
+    fecha = columnar.a_dia(df_bd["fec_doc"])
+    centavos = columnar.a_centavos(df_bd["imp_mov_mo"])
 
-    df["Fecha_BD"] = pd.to_datetime(df["fec_doc"], errors="coerce").dt.date
-    df["Monto_BD"] = pd.to_numeric(df["imp_mov_mo"], errors="coerce").round(2)
+    validas = (fecha.notna() & centavos.notna()).to_numpy()
+    fecha = fecha[validas]
+    centavos = centavos[validas]
 
-    df["Fecha_norm"] = df["Fecha_BD"]
-    df["Monto_norm"] = df["Monto_BD"]
+    return pd.DataFrame({
+        "Fecha_BD": fecha,
+        "Monto_BD": centavos.to_numpy(dtype="float64") / 100,
+        "nro_trans": df_bd["nro_trans"][validas],
+        "_clave": columnar.clave_dia_monto(fecha, centavos),
+    }).reset_index(drop=True)
 
-    df = df[df["Fecha_norm"].notna() & df["Monto_norm"].notna()]
+# candidatos de la BD que se sugieren por cada línea no encontrada
+K_SUGERENCIAS = 3
 
-    return df
 
-def comparar(df_excel: pd.DataFrame, df_bd: pd.DataFrame) -> pd.DataFrame:
+def comparar(
+    df_excel: pd.DataFrame,
+    df_bd: pd.DataFrame,
+    k_sugerencias: int = K_SUGERENCIAS,
+    nro_conciliados: tuple = (),
+) -> pd.DataFrame:
     """
     Compara movimientos del Excel contra la BD por (Fecha, Monto),
     y devuelve TODAS las filas del Excel con columnas adicionales:
@@ -96,52 +142,51 @@ def comparar(df_excel: pd.DataFrame, df_bd: pd.DataFrame) -> pd.DataFrame:
     - Fecha_norm, Monto_norm
     - Fecha_BD, Monto_BD, nro_trans
     - Encontrado (True/False)
-    """
+    - Sugerencias: para las no encontradas, los k_sugerencias asientos libres
+      de la BD más cercanos (mismo signo, por diferencia de monto y de fecha).
+      Los asientos cuyo nro_trans está en nro_conciliados (ya usados por el
+      historial en corridas anteriores) no se sugieren.
 
-    df_excel_norm = _normalizar_excel(df_excel)
-    df_bd_norm = _normalizar_bd(df_bd)
-
-    # Left join → TODO el Excel, y trae datos BD si hay coincidencia
-    merged = df_excel_norm.merge(
-        df_bd_norm[["Fecha_norm", "Monto_norm", "Fecha_BD", "Monto_BD", "nro_trans"]],
-        how="left",
-        on=["Fecha_norm", "Monto_norm"],
-        indicator=True
-    )
-
-    # Partimos del Excel normalizado
-    resultado = df_excel_norm.copy()
+    Si la BD tiene varios asientos con el mismo día y monto, se informa el
+    primero: cada línea del extracto aparece una sola vez en el resultado.
+    """
+    with etapa("comparacion", filas_entrada=len(df_excel), filas_bd=len(df_bd)) as reg:
+        resultado = _comparar(df_excel, df_bd, k_sugerencias, nro_conciliados)
+        reg.filas_salida = len(resultado)
+    return resultado
 
-    # Agregamos columnas BD
-    resultado["Fecha_BD"] = merged["Fecha_BD"]
-    resultado["Monto_BD"] = merged["Monto_BD"]
-    resultado["nro_trans"] = merged["nro_trans"]
-    resultado["Encontrado"] = merged["_merge"].eq("both")
 
-    # -------------------------------------
-    # 🔥 ELIMINAR COLUMNAS NO NECESARIAS
-    # -------------------------------------
-    # Trabajamos en lower para no depender de mayúsculas/acentos
-    drop_targets_lower = {
-        "número de documento",
-        "numero de documento",
-        "asunto",
-        "dependencia",
-        "débito",
-        "debito",
-        "crédito",
-        "credito",
-        "saldo",
-        "referencia",
-        "destino",
-    }
-
-    cols_a_eliminar = [
-        c for c in resultado.columns
-        if c.lower() in drop_targets_lower
-    ]
-
-    resultado = resultado.drop(columns=cols_a_eliminar, errors="ignore")
+def _comparar(
+    df_excel: pd.DataFrame,
+    df_bd: pd.DataFrame,
+    k_sugerencias: int = K_SUGERENCIAS,
+    nro_conciliados: tuple = (),
+) -> pd.DataFrame:
+    # 🔥 Las columnas no necesarias ni se copian
+    conservar = [c for c in df_excel.columns if c.lower() not in _COLUMNAS_DESCARTADAS]
+
+    with etapa("normalizacion_excel", filas_entrada=len(df_excel)) as reg:
+        resultado = _normalizar_excel(df_excel, conservar)
+        reg.filas_salida = len(resultado)
+    with etapa("normalizacion_bd", filas_entrada=len(df_bd)) as reg:
+        df_bd_norm = _normalizar_bd(df_bd)
+        reg.filas_salida = len(df_bd_norm)
+
+    # Left join por clave (día, centavos) → TODO el Excel, y trae datos BD si hay coincidencia
+    with etapa("cruce", filas_entrada=len(resultado)) as reg:
+        fila_bd = _buscar_en_bd(resultado["_clave"].to_numpy(), df_bd_norm["_clave"].to_numpy())
+        encontrado = fila_bd >= 0
+        for col in ["Fecha_BD", "Monto_BD", "nro_trans"]:
+            valores = pd.api.extensions.take(df_bd_norm[col].array, fila_bd, allow_fill=True)
+            resultado[col] = pd.Series(valores, index=resultado.index, name=col)
+        resultado["Encontrado"] = encontrado
+        resultado = resultado.drop(columns="_clave")
+        reg.filas_salida = len(resultado)
+
+    if k_sugerencias > 0:
+        with etapa("sugerencias", filas_entrada=int((~encontrado).sum())) as reg:
+            resultado["Sugerencias"] = _sugerencias(resultado, df_bd_norm, fila_bd, k_sugerencias, nro_conciliados)
+            reg.filas_salida = int(resultado["Sugerencias"].notna().sum())
 
     # -------------------------------------
     # 🏷 RENOMBRAR DESCRIPCIÓN / CONCEPTO
@@ -191,8 +236,8 @@ def comparar(df_excel: pd.DataFrame, df_bd: pd.DataFrame) -> pd.DataFrame:
     for c in ["Fecha_BD", "Monto_BD"]:
         if c in resultado.columns:
             orden_preferido.append(c)
-    # 5) identificador + flag
-    for c in ["nro_trans", "Encontrado"]:
+    # 5) identificador + flag + candidatos sugeridos
+    for c in ["nro_trans", "Encontrado", "Sugerencias"]:
         if c in resultado.columns:
             orden_preferido.append(c)
 
@@ -205,10 +250,206 @@ def comparar(df_excel: pd.DataFrame, df_bd: pd.DataFrame) -> pd.DataFrame:
     return resultado.reset_index(drop=True)
 
 
+def _buscar_en_bd(claves_excel: np.ndarray, claves_bd: np.ndarray) -> np.ndarray:
+    """
+    Para cada clave del extracto, la fila de la BD con la misma clave
+    (la primera, si hay repetidas) o -1 si no está.
+    """
+    if len(claves_bd) == 0:
+        return np.full(len(claves_excel), -1, dtype=np.intp)
+    unicas, primera = np.unique(claves_bd, return_index=True)
+    pos = np.searchsorted(unicas, claves_excel)
+    pos[pos == len(unicas)] = 0
+    return np.where(unicas[pos] == claves_excel, primera[pos], -1)
+
+
+# ---------- sugerencias para las no encontradas ----------
+# la clave de orden empaqueta |centavos| y el día: |centavos| * 2**17 + día
+_BITS_DIA = 17
+
+
+def _dias(fechas: pd.Series) -> np.ndarray:
+    return fechas.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def _centavos(montos: pd.Series) -> np.ndarray:
+    return np.round(montos.to_numpy(dtype="float64") * 100).astype(np.int64)
+
+
+def _nro_texto(nro: pd.Series) -> np.ndarray:
+    """nro_trans como texto, igual que lo guarda el historial (123.0 -> "123")."""
+    if pd.api.types.is_float_dtype(nro.dtype) and (nro.dropna() % 1 == 0).all():
+        nro = nro.astype("Int64")
+    return nro.astype("string").to_numpy(dtype=object, na_value=None)
+
+
+def _sugerencias(
+    resultado: pd.DataFrame,
+    df_bd_norm: pd.DataFrame,
+    fila_bd: np.ndarray,
+    k: int,
+    nro_conciliados: tuple = (),
+) -> pd.Series:
+    """
+    Para cada línea no encontrada, los k asientos de la BD que no coincidieron
+    con ninguna línea y están más cerca: mismo signo, menor diferencia de monto
+    y, a igual diferencia, menor distancia en días.
+
+    Por signo, los asientos libres se ordenan por (|monto|, día) en una sola
+    clave int64 y se agrupan por monto. Los k mejores están entre los k montos
+    distintos más cercanos de cada lado; dentro de cada uno de esos grupos,
+    searchsorted ubica el día de la línea y se toman los k días vecinos de
+    cada lado (O((n·k² + m) log m), sin pares n × m). Así un monto que se repite
+    todos los meses (comisiones, transferencias fijas) aporta sus fechas más
+    cercanas y no las del borde del grupo.
+    """
+    sugerencias = pd.Series(None, index=resultado.index, dtype=object, name="Sugerencias")
+    pendientes = np.flatnonzero(fila_bd < 0)
+    usadas = np.zeros(len(df_bd_norm), dtype=bool)
+    usadas[fila_bd[fila_bd >= 0]] = True
+    if len(nro_conciliados):
+        # conciliados en corridas anteriores: siguen en el mayor pero no están libres
+        usadas |= np.isin(_nro_texto(df_bd_norm["nro_trans"]), list(nro_conciliados))
+    libres = np.flatnonzero(~usadas)
+    if not len(pendientes) or not len(libres):
+        return sugerencias
+
+    dia_bd = _dias(df_bd_norm["Fecha_BD"])[libres]
+    cent_bd = _centavos(df_bd_norm["Monto_BD"])[libres]
+    dia_ex = _dias(resultado["Fecha_norm"])[pendientes]
+    cent_ex = _centavos(resultado["Monto_norm"])[pendientes]
+    base = min(dia_bd.min(), dia_ex.min())
+    tope_dia = (1 << _BITS_DIA) - 1
+
+    def _clave(monto_abs, dia):
+        return (monto_abs << _BITS_DIA) + np.clip(dia - base, 0, tope_dia)
+
+    vecinos = np.arange(-k, k)  # k de cada lado
+    elegidos = np.full((len(pendientes), k), -1, dtype=np.int64)  # posición en `libres`
+    for signo in (True, False):  # créditos y débitos por separado
+        q = np.flatnonzero((cent_ex >= 0) == signo)
+        c = np.flatnonzero((cent_bd >= 0) == signo)
+        if not len(q) or not len(c):
+            continue
+
+        clave_c = _clave(np.abs(cent_bd[c]), dia_bd[c])
+        orden = np.argsort(clave_c, kind="stable")
+        clave_c, c = clave_c[orden], c[orden]
+        montos, inicio = np.unique(np.abs(cent_bd[c]), return_index=True)
+        fin = np.append(inicio[1:], len(c))
+
+        # los k montos distintos más cercanos de cada lado
+        grupo = np.searchsorted(montos, np.abs(cent_ex[q]))[:, None] + vecinos
+        grupo_valido = (grupo >= 0) & (grupo < len(montos))
+        grupo = np.clip(grupo, 0, len(montos) - 1)
+
+        # dentro de cada grupo, los k días más cercanos de cada lado
+        pos = np.searchsorted(clave_c, _clave(montos[grupo], dia_ex[q][:, None]))
+        ventana = pos[:, :, None] + vecinos
+        valida = (
+            grupo_valido[:, :, None]
+            & (ventana >= inicio[grupo][:, :, None])
+            & (ventana < fin[grupo][:, :, None])
+        ).reshape(len(q), -1)
+        cand = c[np.clip(ventana, 0, len(c) - 1)].reshape(len(q), -1)
+
+        d_monto = np.abs(cent_bd[cand] - cent_ex[q][:, None])
+        d_dias = np.minimum(np.abs(dia_bd[cand] - dia_ex[q][:, None]), tope_dia)
+        puntaje = np.where(valida, (d_monto << _BITS_DIA) + d_dias, np.iinfo(np.int64).max)
+
+        mejores = np.argsort(puntaje, axis=1, kind="stable")[:, :k]
+        filas = np.arange(len(q))[:, None]
+        elegidos[q, :mejores.shape[1]] = np.where(valida[filas, mejores], cand[filas, mejores], -1)
+
+    # texto: "nro 123 03/01/2024 -1500.00 (Δ 0.50, 1 d)", separados por " | "
+    nro = df_bd_norm["nro_trans"].to_numpy()[libres]
+    if nro.dtype.kind == "f" and np.all(np.isnan(nro) | (nro == np.round(nro))):
+        nro = pd.array(nro, dtype="Int64")
+    fechas = pd.Series(df_bd_norm["Fecha_BD"].to_numpy()[libres]).dt.strftime("%d/%m/%Y").to_numpy()
+    textos = []
+    for i, fila in enumerate(elegidos):
+        partes = [
+            f"nro {nro[j]} {fechas[j]} {cent_bd[j] / 100:.2f} "
+            f"(Δ {abs(cent_bd[j] - cent_ex[i]) / 100:.2f}, {abs(dia_bd[j] - dia_ex[i])} d)"
+            for j in fila if j >= 0
+        ]
+        textos.append(" | ".join(partes) if partes else None)
+    sugerencias.iloc[pendientes] = textos
+    return sugerencias
+
+
+# ---------- cache de sesión ----------
+def huella_df(df: pd.DataFrame) -> str:
+    """
+    Huella del contenido de un DataFrame (columnas, tipos, índice y valores).
+    Dos DataFrames con los mismos datos tienen la misma huella.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(df.columns)).encode("utf-8"))
+    h.update(repr([str(t) for t in df.dtypes]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class CacheComparaciones:
+    """
+    Memoiza comparar() durante la sesión, por huella del extracto (ya
+    filtrado por el historial), huella de la BD y ajustes del comparador.
+    Volver a comparar el mismo archivo sin exportar en el medio acierta:
+    el historial y los nro_trans conciliados solo cambian al confirmar una
+    exportación. Exportar y el visor usan directamente df_comparacion.
+
+    Si cambia el archivo, el banco o la foto de la BD cambian las huellas y
+    la entrada anterior simplemente deja de usarse (se descarta por LRU).
+    Los DataFrames de entrada y el resultado se tratan como inmutables.
+    """
+
+    def __init__(self, max_entradas: int = 4):
+        self.max_entradas = max_entradas
+        self._resultados = OrderedDict()
+        # id(df) -> (weakref al df, huella): evita re-hashear el mismo objeto
+        self._huellas = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _huella(self, df: pd.DataFrame) -> str:
+        previa = self._huellas.get(id(df))
+        if previa is not None and previa[0]() is df:
+            return previa[1]
+        huella = huella_df(df)
+        self._huellas = {k: v for k, v in self._huellas.items() if v[0]() is not None}
+        self._huellas[id(df)] = (weakref.ref(df), huella)
+        return huella
+
+    def clave(self, df_excel: pd.DataFrame, df_bd: pd.DataFrame, **ajustes) -> tuple:
+        return (self._huella(df_excel), self._huella(df_bd), tuple(sorted(ajustes.items())))
+
+    def comparar(self, df_excel: pd.DataFrame, df_bd: pd.DataFrame, **ajustes) -> pd.DataFrame:
+        # los ajustes omitidos valen lo mismo que pasados con su valor por defecto
+        ajustes = {"k_sugerencias": K_SUGERENCIAS, **ajustes}
+        clave = self.clave(df_excel, df_bd, **ajustes)
+        if clave in self._resultados:
+            self.aciertos += 1
+            self._resultados.move_to_end(clave)
+            return self._resultados[clave]
+
+        self.fallos += 1
+        resultado = comparar(df_excel, df_bd, **ajustes)
+        self._resultados[clave] = resultado
+        while len(self._resultados) > self.max_entradas:
+            self._resultados.popitem(last=False)
+        return resultado
+
+    def invalidar(self):
+        self._resultados.clear()
+        self._huellas.clear()
+
+
 def comparar_y_exportar(
     df_excel: pd.DataFrame,
     df_bd: pd.DataFrame,
-    ruta_salida: str
+    ruta_salida: str,
+    cache: CacheComparaciones | None = None,
 ) -> Tuple[pd.DataFrame, str]:
     """
     Compara Excel vs BD y exporta TODOS los movimientos del Excel,
@@ -216,15 +457,27 @@ def comparar_y_exportar(
 
     - df_excel: DataFrame con movimientos del estado de cuenta.
     - df_bd:    DataFrame con la tabla m_cpf_contaux (incluyendo fec_doc, imp_mov_mo, nro_trans).
-    - ruta_salida: ruta del archivo .xlsx a crear.
+    - ruta_salida: ruta del archivo a crear (.xlsx, .csv o .parquet).
+    - cache: si se pasa, reutiliza la comparación ya calculada para estas entradas.
 
     Devuelve:
         (df_resultado, ruta_salida)
     """
-    resultado = comparar(df_excel, df_bd)
-
-    with pd.ExcelWriter(ruta_salida, engine="openpyxl") as writer:
-        resultado.to_excel(writer, sheet_name="Comparacion", index=False)
+    if cache is not None:
+        resultado = cache.comparar(df_excel, df_bd)
+    else:
+        resultado = comparar(df_excel, df_bd)
+    exportar(resultado, ruta_salida)
 
     return resultado, ruta_salida
 
+
+def exportar(resultado: pd.DataFrame, ruta_salida: str) -> str:
+    """
+    Exporta un resultado ya calculado por comparar() sin volver a comparar.
+    El formato sale de la extensión (.xlsx con hoja Resumen, .csv, .parquet).
+    """
+    import exportador
+
+    return exportador.exportar(resultado, ruta_salida)
+
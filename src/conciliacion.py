@@ -0,0 +1,424 @@
+# conciliacion.py
+"""
+Punto de entrada de línea de comandos (sin Tkinter) para correr conciliaciones
+desde cron o servidores sin pantalla.
+
+Ejecuta el mismo flujo que ComparadorApp:
+    procesar_itau / procesar_brou -> obtener_df_bd -> comparador.comparar
+
+Uso (desde src/):
+    python -m conciliacion run --bank itau --file extracto.xlsx --out resultado.xlsx
+    python -m conciliacion serve --port 8765          # servicio con caches calientes
+    python -m conciliacion run --bank itau --file extracto.xlsx --servicio
+    python -m conciliacion run --bank itau --file extracto.xlsx --trabajo  # reanudable
+    python -m conciliacion run --bank itau --file extracto.xlsx --parquet mayor/  # sin la BD
+    python -m conciliacion watch --dir /ruta/extractos  # concilia lo que llega
+
+Imprime un resumen JSON en stdout. Códigos de salida:
+    0  la tasa de coincidencias alcanza --min-tasa
+    1  la tasa de coincidencias quedó por debajo de --min-tasa
+    2  argumentos inválidos
+    3  error leyendo el archivo, la BD o exportando
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SALIDA_OK = 0
+SALIDA_TASA_BAJA = 1
+SALIDA_USO = 2
+SALIDA_ERROR = 3
+
+# nombre canónico de cada banco (el mismo que usa el combo de la GUI)
+BANCOS = {
+    "itau": "Itaú",
+    "itaú": "Itaú",
+    "brou": "BROU",
+}
+
+
+@dataclass
+class Corrida:
+    banco: str
+    archivo: str
+    df_excel: pd.DataFrame | None = None
+    df_bd: pd.DataFrame | None = None
+    df_comparacion: pd.DataFrame | None = None
+    omitidos_historial: int = 0
+    segundos: dict = field(default_factory=dict)
+    avisos: list = field(default_factory=list)
+    # resumen calculado por el servicio (corridas remotas: los DataFrames
+    # de entrada quedan en el servicio y solo viaja el resultado)
+    remoto: dict | None = None
+    # el resultado se guarda en el historial recién cuando se exporta (confirmar)
+    historial_pendiente: bool = False
+
+
+def normalizar_banco(banco: str) -> str:
+    clave = banco.strip().lower()
+    if clave not in BANCOS:
+        raise ValueError(f"Banco desconocido: {banco}")
+    return BANCOS[clave]
+
+
+# ---------- flujo ----------
+# filas por lote al leer la BD (entre lotes se informa progreso y se puede cancelar)
+LOTE_BD = 50_000
+
+
+class Cancelado(BaseException):
+    """
+    La corrida se canceló entre etapas o entre lotes.
+    Hereda de BaseException (como KeyboardInterrupt) para que los
+    `except Exception` de los lectores y de db no la oculten.
+    """
+
+
+def leer_extracto_banco(banco: str, ruta: str) -> pd.DataFrame:
+    """Lee el extracto con el lector del banco (nombre canónico)."""
+    if banco == "Itaú":
+        import lectorItau
+        return lectorItau.procesar_itau(ruta)
+    import lectorBrou
+    return lectorBrou.procesar_brou(ruta)
+
+
+# días de mayor que se leen antes y después del extracto: los asientos cercanos
+# a los bordes siguen siendo candidatos para las Sugerencias
+MARGEN_MAYOR_DIAS = 31
+
+
+def ventana_mayor(df_excel: pd.DataFrame, margen_dias: int = MARGEN_MAYOR_DIAS) -> tuple:
+    """
+    (desde, hasta) del mayor a leer para este extracto: sus fechas ± margen.
+    Todas las corridas (run, GUI, servicio, --trabajo, watch) usan la misma
+    ventana, así dan el mismo resultado. (None, None) si no hay fechas.
+    """
+    from datetime import timedelta
+
+    import pandas as pd
+
+    fechas = pd.to_datetime(df_excel["Fecha"], errors="coerce").dropna() if "Fecha" in df_excel else []
+    if not len(fechas):
+        return None, None
+    margen = timedelta(days=margen_dias)
+    return fechas.min().date() - margen, fechas.max().date() + margen
+
+
+def leer_mayor(cod_tit: str, al_leer_lote=None, desde=None, hasta=None) -> pd.DataFrame | None:
+    """Movimientos no conciliados de la BD (opcionalmente en una ventana de fechas), por lotes de LOTE_BD filas."""
+    import db
+    return db.obtener_df_bd(cod_tit, chunksize=LOTE_BD, al_leer_lote=al_leer_lote, desde=desde, hasta=hasta)
+
+
+def ejecutar(
+    banco: str,
+    ruta: str,
+    usar_historial: bool = True,
+    progreso=None,
+    cancelado=None,
+    cache=None,
+    leer_extracto=None,
+    obtener_mayor=None,
+    k_sugerencias: int | None = None,
+) -> Corrida:
+    """
+    Lee el extracto, descarta lo ya conciliado (historial), consulta la BD
+    y compara. Lanza excepción ante cualquier error.
+
+    - progreso: callable(etapa, filas) que se llama al empezar y terminar
+      cada etapa ("lectura", "historial", "bd", "comparacion") y por cada lote de BD.
+    - cancelado: threading.Event; si se activa, lanza Cancelado en el próximo
+      punto de corte (entre etapas o entre lotes de BD).
+    - cache: comparador.CacheComparaciones para reutilizar comparaciones.
+    - leer_extracto: callable(banco, ruta) -> DataFrame en lugar del lector
+      del banco (el servicio lo usa para reusar archivos ya parseados).
+    - obtener_mayor: callable(cod_tit, al_leer_lote, desde=, hasta=) ->
+      DataFrame | None en lugar de db.obtener_df_bd (el servicio devuelve su
+      foto en memoria). desde/hasta es ventana_mayor() del extracto.
+    - k_sugerencias: candidatos de la BD sugeridos por línea no encontrada
+      (None = comparador.K_SUGERENCIAS, 0 = sin sugerencias).
+    """
+    banco = normalizar_banco(banco)
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No existe el archivo: {ruta}")
+
+    def _avisar(etapa: str, filas: int):
+        if cancelado is not None and cancelado.is_set():
+            raise Cancelado()
+        if progreso is not None:
+            progreso(etapa, filas)
+
+    corrida = Corrida(banco=banco, archivo=ruta)
+
+    _avisar("lectura", 0)
+    t0 = time.perf_counter()
+    corrida.df_excel = (leer_extracto or leer_extracto_banco)(banco, ruta)
+    corrida.segundos["lectura"] = time.perf_counter() - t0
+    if corrida.df_excel is None or corrida.df_excel.empty:
+        raise ValueError("El lector devolvió un DataFrame vacío.")
+    if "Saldo_OK" in corrida.df_excel.columns:
+        cortes = int(corrida.df_excel["Saldo_OK"].eq(False).sum())
+        if cortes:
+            corrida.avisos.append(f"El saldo no encadena en {cortes} filas (ver columna Saldo_OK): "
+                                  "puede faltar o sobrar alguna línea del extracto.")
+    _avisar("lectura", len(corrida.df_excel))
+
+    if usar_historial:
+        import historial
+        try:
+            corrida.df_excel, corrida.omitidos_historial = historial.filtrar_conciliados(corrida.df_excel, banco)
+        except Exception as e:
+            # El historial es una optimización: si falla, seguimos con el extracto completo
+            corrida.avisos.append(f"No se pudo consultar el historial: {e}")
+            usar_historial = False
+        _avisar("historial", len(corrida.df_excel))
+        if corrida.df_excel.empty:
+            # todo lo del extracto ya estaba conciliado: no hay nada que consultar
+            return corrida
+
+    _avisar("bd", 0)
+    t0 = time.perf_counter()
+    import db
+    desde, hasta = ventana_mayor(corrida.df_excel)
+    corrida.df_bd = (obtener_mayor or leer_mayor)(
+        db.cod_tit_para_banco(banco),
+        lambda filas: _avisar("bd", filas),
+        desde=desde,
+        hasta=hasta,
+    )
+    if corrida.df_bd is None:
+        raise RuntimeError("No se pudo leer la base de datos.")
+    corrida.segundos["bd"] = time.perf_counter() - t0
+    _avisar("bd", len(corrida.df_bd))
+
+    _avisar("comparacion", 0)
+    t0 = time.perf_counter()
+    import comparador
+    ajustes = {} if k_sugerencias is None else {"k_sugerencias": k_sugerencias}
+    if usar_historial and k_sugerencias != 0:
+        try:
+            conciliados = historial.nro_trans_conciliados(banco)
+        except Exception as e:
+            conciliados = []
+            corrida.avisos.append(f"No se pudo consultar el historial: {e}")
+        if conciliados:
+            # sus asientos no se ofrecen como sugerencia para las líneas nuevas
+            ajustes["nro_conciliados"] = tuple(conciliados)
+    if cache is not None:
+        corrida.df_comparacion = cache.comparar(corrida.df_excel, corrida.df_bd, **ajustes)
+    else:
+        corrida.df_comparacion = comparador.comparar(corrida.df_excel, corrida.df_bd, **ajustes)
+    corrida.segundos["comparacion"] = time.perf_counter() - t0
+    _avisar("comparacion", len(corrida.df_comparacion))
+
+    # No se registra acá: una comparación que nadie exportó no puede esconder
+    # sus líneas en las corridas siguientes. Ver confirmar().
+    corrida.historial_pendiente = usar_historial
+    return corrida
+
+
+def confirmar(corrida: Corrida) -> int:
+    """
+    Guarda en el historial las líneas de una corrida ya exportada, para que
+    las próximas corridas descarten las que se conciliaron. Se llama después
+    de exportar con éxito; sin historial pendiente no hace nada. Devuelve las
+    líneas registradas. Si el historial falla queda como aviso (el historial
+    es una optimización: no invalida lo exportado).
+    """
+    if not corrida.historial_pendiente:
+        return 0
+    try:
+        if corrida.remoto is not None:
+            # el resultado completo (con las huellas) quedó en el servicio
+            import servicio
+            registradas = servicio.confirmar_remoto(corrida)
+        else:
+            import historial
+            registradas = historial.registrar(corrida.df_comparacion, corrida.banco)
+    except Exception as e:
+        corrida.avisos.append(f"No se pudo actualizar el historial: {e}")
+        return 0
+    corrida.historial_pendiente = False
+    return registradas
+
+
+def resumen(corrida: Corrida, salida: str | None = None) -> dict:
+    if corrida.remoto is not None:
+        remoto = {k: v for k, v in corrida.remoto.items() if k not in ("servicio", "corrida")}
+        return {**remoto, "archivo": corrida.archivo, "salida": salida,
+                "segundos": {k: round(v, 3) for k, v in corrida.segundos.items()}}
+    total = len(corrida.df_comparacion) if corrida.df_comparacion is not None else 0
+    encontrados = int(corrida.df_comparacion["Encontrado"].sum()) if total else 0
+    return {
+        "banco": corrida.banco,
+        "archivo": corrida.archivo,
+        "filas_extracto": len(corrida.df_excel) if corrida.df_excel is not None else 0,
+        "omitidos_historial": corrida.omitidos_historial,
+        "filas_bd": len(corrida.df_bd) if corrida.df_bd is not None else 0,
+        "total": total,
+        "encontrados": encontrados,
+        "no_encontrados": total - encontrados,
+        # sin movimientos nuevos no queda nada pendiente de conciliar
+        "tasa": round(encontrados / total, 4) if total else 1.0,
+        "salida": salida,
+        "segundos": {k: round(v, 3) for k, v in corrida.segundos.items()},
+        "avisos": corrida.avisos,
+    }
+
+
+# ---------- CLI ----------
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="conciliacion",
+        description="Conciliación bancaria sin interfaz gráfica.",
+    )
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    run = sub.add_parser("run", help="Procesa un extracto y lo compara contra la BD.")
+    run.add_argument("--bank", required=True, choices=["itau", "brou"], help="Banco del extracto.")
+    run.add_argument("--file", required=True, help="Archivo .xls/.xlsx del banco.")
+    run.add_argument("--out", help="Ruta del archivo de resultado a exportar (opcional). Solo las corridas "
+                                   "exportadas se registran en el historial de conciliados.")
+    run.add_argument("--min-tasa", type=float, default=1.0,
+                     help="Tasa mínima de coincidencias (0-1) para salir con código 0. Por defecto 1.0.")
+    run.add_argument("--sin-historial", action="store_true",
+                     help="No descartar ni registrar movimientos en el historial de conciliados.")
+    run.add_argument("--traza", metavar="RUTA",
+                     help="Escribe tiempos, filas y pico de memoria por etapa como JSON lines ('-' = stderr). "
+                          "Medir memoria (tracemalloc) hace más lenta la corrida.")
+    run.add_argument("--traza-sin-memoria", action="store_true",
+                     help="Con --traza, registra solo tiempos y filas (sin tracemalloc).")
+    run.add_argument("--sugerencias", type=int, metavar="K",
+                     help="Candidatos de la BD sugeridos por cada línea no encontrada (0 = ninguno; por defecto 3).")
+    run.add_argument("--trabajo", metavar="DIR", nargs="?", const="",
+                     help="Guardar puntos de control en DIR (por defecto CONCILIACION_TRABAJOS o "
+                          "~/.conciliacion_bancaria/trabajos) y retomar una corrida cortada con las mismas entradas.")
+    run.add_argument("--servicio", metavar="URL", nargs="?", const="",
+                     help="Delegar la corrida en un servicio ya levantado (`serve`). Sin URL usa "
+                          "CONCILIACION_SERVICIO o http://127.0.0.1:8765.")
+
+    serve = sub.add_parser("serve", help="Servicio local con BD, mayores y layouts en memoria.")
+    serve.add_argument("--host", default="127.0.0.1", help="Interfaz donde escuchar (por defecto solo local).")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--ttl-mayor", type=float, default=300,
+                       help="Segundos que se reutiliza la foto del mayor antes de releer la BD.")
+    serve.add_argument("--precargar", nargs="*", choices=["itau", "brou"], default=[],
+                       help="Bancos cuyo mayor se lee al arrancar.")
+
+    watch = sub.add_parser("watch", help="Concilia los extractos que llegan a una carpeta (inotify, Linux).")
+    watch.add_argument("--dir", required=True, help="Carpeta donde se dejan los extractos.")
+    watch.add_argument("--workers", type=int, default=2, help="Archivos procesados en paralelo.")
+    watch.add_argument("--debounce", type=float, default=2.0,
+                       help="Segundos sin eventos antes de considerar estable un archivo.")
+    watch.add_argument("--sin-historial", action="store_true",
+                       help="No descartar ni registrar movimientos en el historial de conciliados.")
+    watch.add_argument("--procesar-existentes", action="store_true",
+                       help="Procesar también los extractos que ya están en la carpeta.")
+
+    for sub_parser in (run, serve, watch):
+        sub_parser.add_argument("--parquet", metavar="RUTA",
+                                help="Leer el mayor de un export Parquet de m_cpf_contaux (archivo, carpeta o glob) "
+                                     "con DuckDB en lugar de PostgreSQL. Equivale a CONCILIACION_MAYOR_PARQUET.")
+    return parser
+
+
+def _run(args) -> int:
+    if args.out:
+        # antes de leer nada: un --out inválido no debe costar una corrida entera
+        import exportador
+        try:
+            exportador.formato_para(args.out)
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+            print(f"❌ {e}", file=sys.stderr)
+            return SALIDA_USO
+
+    if args.traza:
+        import instrumentacion
+        instrumentacion.configurar(
+            instrumentacion.SumideroJSONL(sys.stderr if args.traza == "-" else args.traza),
+            memoria=not args.traza_sin_memoria,
+        )
+
+    # Los lectores y db informan con print: los mandamos a stderr para que
+    # stdout quede solo con el JSON.
+    trabajo = None
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.servicio is not None:
+            import servicio
+            corrida = servicio.ejecutar_remoto(
+                args.bank, args.file, url=args.servicio or None, usar_historial=not args.sin_historial,
+                k_sugerencias=args.sugerencias,
+            )
+        elif args.trabajo is not None:
+            import puntos_control
+            corrida, trabajo = puntos_control.ejecutar_reanudable(
+                args.bank, args.file, raiz=args.trabajo or None, usar_historial=not args.sin_historial,
+                k_sugerencias=args.sugerencias,
+            )
+        else:
+            corrida = ejecutar(args.bank, args.file, usar_historial=not args.sin_historial,
+                               k_sugerencias=args.sugerencias)
+        if args.out and corrida.df_comparacion is not None:
+            import comparador
+            t0 = time.perf_counter()
+            comparador.exportar(corrida.df_comparacion, args.out)
+            corrida.segundos["exportacion"] = time.perf_counter() - t0
+            confirmar(corrida)
+        if trabajo is not None:
+            # exportado: ya no hace falta retomar
+            trabajo.limpiar()
+
+    exportado = args.out if (args.out and corrida.df_comparacion is not None) else None
+    datos = resumen(corrida, exportado)
+    print(json.dumps(datos, ensure_ascii=False))
+    return SALIDA_OK if datos["tasa"] >= args.min_tasa else SALIDA_TASA_BAJA
+
+
+def main(argv=None) -> int:
+    args = _parser().parse_args(argv)
+    if args.parquet:
+        # por entorno: también lo ven los procesos del pool de `watch`
+        os.environ["CONCILIACION_MAYOR_PARQUET"] = args.parquet
+
+    try:
+        if args.comando == "run":
+            return _run(args)
+        if args.comando == "serve":
+            import servicio
+            servicio.servir(args.host, args.port, ttl_mayor=args.ttl_mayor, precargar=args.precargar)
+            return SALIDA_OK
+        if args.comando == "watch":
+            import vigilante
+            try:
+                vigilante.vigilar(
+                    args.dir,
+                    trabajadores=args.workers,
+                    debounce=args.debounce,
+                    usar_historial=not args.sin_historial,
+                    procesar_existentes=args.procesar_existentes,
+                )
+            except KeyboardInterrupt:
+                pass
+            return SALIDA_OK
+    except Exception as e:
+        print(json.dumps({"error": str(e)}, ensure_ascii=False))
+        print(f"❌ {e}", file=sys.stderr)
+        return SALIDA_ERROR
+
+    return SALIDA_USO
+
+
+if __name__ == "__main__":
+    sys.exit(main())
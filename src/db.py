@@ -1,7 +1,16 @@
-import pandas as pd
-from sqlalchemy import create_engine, text
-import socket
-import psycopg2
+from __future__ import annotations
+
+import os
+import re
+from typing import TYPE_CHECKING, Protocol
+
+from instrumentacion import etapa
+
+# pandas y SQLAlchemy se importan recién al usarlos: importar este módulo
+# (o main.py) no debe pagar la carga de las dependencias pesadas.
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
 
 
 # Configuración para PostgreSQL
@@ -13,37 +22,233 @@ POSTGRES_CONFIG = {
     "port": "54322"
 }
 
-# Crear engine para PostgreSQL
-engine = create_engine(
-    f"postgresql+psycopg2://{POSTGRES_CONFIG['user']}:{POSTGRES_CONFIG['password']}@"
-    f"{POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
-)
+# Cuenta contable (cod_tit) de cada banco en m_cpf_contaux
+COD_TIT_POR_BANCO = {
+    "itau": "113",
+    "brou": "001",
+}
+
+# Columnas que trae obtener_df_bd por defecto: solo lo que usa el comparador
+# (SELECT * traía todo el asiento como texto y multiplicaba la memoria).
+COLUMNAS_BD = ("nro_trans", "fec_doc", "imp_mov_mo")
+
+_IDENTIFICADOR = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# Export Parquet de conciliacion.m_cpf_contaux para trabajar sin la BD
+# (archivo, carpeta —se leen todos los *.parquet, con particiones hive— o glob)
+ENV_PARQUET = "CONCILIACION_MAYOR_PARQUET"
+
+_engine = None
+_backend = None
+
+
+def obtener_engine() -> Engine:
+    """Crea el engine de PostgreSQL en el primer uso y lo reutiliza."""
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+
+        _engine = create_engine(
+            f"postgresql+psycopg2://{POSTGRES_CONFIG['user']}:{POSTGRES_CONFIG['password']}@"
+            f"{POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
+        )
+    return _engine
+
+
+def __getattr__(name: str):
+    # Compatibilidad: `db.engine` sigue funcionando, pero se crea al accederlo
+    if name == "engine":
+        return obtener_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def cod_tit_para_banco(banco: str) -> str:
+    """Devuelve el cod_tit del banco ("Itaú", "itau", "BROU", ...)."""
+    clave = banco.strip().lower().replace("ú", "u")
+    if clave not in COD_TIT_POR_BANCO:
+        raise ValueError(f"Banco desconocido: {banco}")
+    return COD_TIT_POR_BANCO[clave]
+
+
+# ---------- backends del mayor ----------
+class BackendMayor(Protocol):
+    """De dónde sale el mayor: recibe la consulta ya armada y devuelve el DataFrame crudo."""
+
+    nombre: str
+
+    def leer(self, columnas, filtros: list[str], params: dict, chunksize: int | None, al_leer_lote) -> pd.DataFrame:
+        ...
+
+
+def _consulta(origen: str, columnas, filtros: list[str]) -> str:
+    return f"""
+        SELECT {", ".join(f"t.{c}" for c in columnas)}
+        FROM {origen} t
+        WHERE {" AND ".join(filtros)}
+    """
+
+
+class BackendPostgres:
+    """conciliacion.m_cpf_contaux en el PostgreSQL de POSTGRES_CONFIG (comportamiento original)."""
+
+    nombre = "postgres"
+
+    def leer(self, columnas, filtros, params, chunksize, al_leer_lote) -> pd.DataFrame:
+        import pandas as pd
+        from sqlalchemy import text
+
+        sql = _consulta("conciliacion.m_cpf_contaux", columnas, [f.replace("$", ":") for f in filtros])
+        if not chunksize:
+            return pd.read_sql(text(sql), obtener_engine(), params=params)
 
-def obtener_df_bd(cod_tit: str) -> pd.DataFrame | None:
+        lotes = []
+        filas = 0
+        for lote in pd.read_sql(text(sql), obtener_engine(), params=params, chunksize=chunksize):
+            lotes.append(lote)
+            filas += len(lote)
+            if al_leer_lote is not None:
+                al_leer_lote(filas)
+        if not lotes:
+            return pd.read_sql(text(sql + " LIMIT 0"), obtener_engine(), params=params)
+        return pd.concat(lotes, ignore_index=True)
+
+
+class BackendParquet:
+    """
+    Export Parquet de m_cpf_contaux consultado con DuckDB embebido (opcional:
+    pip install duckdb). Los filtros van en el WHERE del scan, así DuckDB los
+    empuja al lector Parquet: descarta row groups por estadísticas (conciliado,
+    fec_doc) y particiones hive (p. ej. cod_tit=113/) sin leerlas, y solo
+    decodifica las columnas pedidas.
+    """
+
+    nombre = "parquet"
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def _origen(self) -> str:
+        ruta = self.ruta
+        if os.path.isdir(ruta):
+            ruta = os.path.join(ruta, "**", "*.parquet")
+        elif not any(c in ruta for c in "*?[") and not os.path.exists(ruta):
+            raise FileNotFoundError(f"No existe el export Parquet del mayor: {ruta}")
+        ruta = ruta.replace("'", "''")
+        return f"read_parquet('{ruta}', hive_partitioning = true, hive_types_autocast = false, union_by_name = true)"
+
+    def leer(self, columnas, filtros, params, chunksize, al_leer_lote) -> pd.DataFrame:
+        sql = _consulta(self._origen(), columnas, filtros)
+        try:
+            import duckdb
+        except ImportError as e:
+            raise RuntimeError(
+                f"El backend Parquet del mayor necesita duckdb (pip install duckdb): {e}"
+            ) from e
+
+        with duckdb.connect() as con:
+            cursor = con.execute(sql, params)
+            if not chunksize:
+                return cursor.fetchdf()
+
+            import pandas as pd
+
+            lotes = []
+            filas = 0
+            vectores = max(1, chunksize // 2048)  # DuckDB entrega vectores de 2048 filas
+            while True:
+                lote = cursor.fetch_df_chunk(vectores)
+                if lote.empty:
+                    break
+                lotes.append(lote)
+                filas += len(lote)
+                if al_leer_lote is not None:
+                    al_leer_lote(filas)
+            return pd.concat(lotes, ignore_index=True) if lotes else lote
+
+
+def configurar_backend(backend: BackendMayor | None = None):
+    """Fija el backend del mayor (None vuelve al de por defecto: Parquet si ENV_PARQUET, si no Postgres)."""
+    global _backend
+    _backend = backend
+
+
+def backend_actual() -> BackendMayor:
+    if _backend is not None:
+        return _backend
+    ruta = os.environ.get(ENV_PARQUET)
+    return BackendParquet(ruta) if ruta else BackendPostgres()
+
+
+def obtener_df_bd(
+    cod_tit: str,
+    chunksize: int | None = None,
+    al_leer_lote=None,
+    columnas=COLUMNAS_BD,
+    desde=None,
+    hasta=None,
+) -> pd.DataFrame | None:
     """
     Devuelve los registros NO conciliados de conciliacion.m_cpf_contaux
     filtrando por:
       - conciliado = false
       - trim(cod_aux) = 'bancos'
       - trim(cod_tit) = cod_tit (string)
-    """
 
-    sql = """
-        SELECT *
-        FROM conciliacion.m_cpf_contaux t
-        WHERE t.conciliado = FALSE
-          AND trim(t.cod_aux) = 'bancos'
-          AND trim(t.cod_tit) = :cod_tit
+    Con chunksize lee por lotes y llama a al_leer_lote(filas_leidas) después
+    de cada uno (para informar progreso o cancelar entre lotes).
+
+    columnas: qué columnas traer (por defecto COLUMNAS_BD). El texto
+    repetitivo se convierte a category al terminar de leer.
+
+    desde / hasta (fechas, inclusive): traen solo los asientos con fec_doc en
+    esa ventana; el resto del mayor no puede coincidir con el extracto.
+
+    La lectura la hace backend_actual(): PostgreSQL, o un export Parquet si
+    se configuró (configurar_backend / CONCILIACION_MAYOR_PARQUET / --parquet).
     """
+    for col in columnas:
+        if not _IDENTIFICADOR.match(col):
+            raise ValueError(f"Nombre de columna inválido: {col!r}")
 
+    # los parámetros se escriben $nombre (DuckDB); Postgres los pasa a :nombre
+    filtros = [
+        "t.conciliado = FALSE",
+        "trim(t.cod_aux) = 'bancos'",
+        "trim(t.cod_tit) = $cod_tit",
+    ]
+    params = {"cod_tit": cod_tit}
+    if desde is not None:
+        filtros.append("t.fec_doc >= $desde")
+        params["desde"] = desde
+    if hasta is not None:
+        filtros.append("t.fec_doc <= $hasta")
+        params["hasta"] = hasta
+
+    backend = backend_actual()
     try:
-        df = pd.read_sql(text(sql), engine, params={"cod_tit": cod_tit})
+        with etapa("bd", cod_tit=cod_tit, backend=backend.nombre) as reg:
+            df = _compactar(backend.leer(columnas, filtros, params, chunksize, al_leer_lote))
+            reg.filas_salida = len(df)
         print(f"📥 Leídos {len(df)} registros de BD para cod_tit={cod_tit}")
         return df
     except Exception as e:
         print(f"❌ Error leyendo BD: {e}")
         return None
-    
+
+
+def _compactar(df: pd.DataFrame) -> pd.DataFrame:
+    """Fechas a datetime64, importes (Decimal de psycopg2) a float64 y texto repetido a category."""
+    import pandas as pd
+
+    import columnar
+
+    if "fec_doc" in df.columns:
+        df["fec_doc"] = columnar.a_dia(df["fec_doc"])
+    for col in ("imp_mov_mo", "imp_neto"):
+        if col in df.columns and df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return columnar.compactar_texto(df)
+
 # Ejecutar la función
 if __name__ == "__main__":
     df = obtener_df_bd()
@@ -0,0 +1,385 @@
+# exportador.py
+"""
+Exportación de resultados de la comparación.
+
+- xlsx: escritor propio en streaming (memoria constante): el XML de cada hoja
+  se genera por lotes, columna a columna con operaciones vectorizadas, y se
+  escribe directo al zip a medida que se producen las filas. No arma el libro
+  en memoria como pd.ExcelWriter/openpyxl. Incluye la hoja "Resumen".
+- csv / parquet: para herramientas downstream.
+
+El resultado puede venir como un DataFrame o como un iterable de DataFrames
+(lotes) con las mismas columnas.
+"""
+from __future__ import annotations
+
+import os
+import re
+import zipfile
+from datetime import datetime
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import etapa
+
+HOJA_COMPARACION = "Comparacion"
+HOJA_RESUMEN = "Resumen"
+
+# nombre de la única pasada que hace hoy comparador.comparar
+PASADA_EXACTA = "Fecha y monto exactos"
+
+TAMANO_LOTE = 10_000
+
+# columnas que el flujo necesita (p. ej. la huella que guarda historial.registrar)
+# pero que no le dicen nada al analista: no se exportan ni se muestran
+COLUMNAS_INTERNAS = ("Huella",)
+
+FORMATOS = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+
+# ---------- utilidades ----------
+def _lotes(datos: pd.DataFrame | Iterable[pd.DataFrame], tamano: int = TAMANO_LOTE):
+    if isinstance(datos, pd.DataFrame):
+        for inicio in range(0, len(datos), tamano):
+            yield datos.iloc[inicio:inicio + tamano]
+        if datos.empty:
+            yield datos
+    else:
+        yield from datos
+
+
+def sin_columnas_internas(df: pd.DataFrame) -> pd.DataFrame:
+    """El resultado sin COLUMNAS_INTERNAS (el mismo objeto si no tiene ninguna)."""
+    internas = [c for c in COLUMNAS_INTERNAS if c in df.columns]
+    return df.drop(columns=internas) if internas else df
+
+
+def formato_para(ruta: str) -> str:
+    ext = os.path.splitext(ruta)[1].lower()
+    if ext not in FORMATOS:
+        raise ValueError(f"Formato de exportación no soportado: '{ext}' (usar .xlsx, .csv o .parquet).")
+    return FORMATOS[ext]
+
+
+def nombre_exportacion(banco: str, ext: str = ".xlsx", origen: str | None = None) -> str:
+    """
+    Nombre estándar del archivo de resultado: ConciliacionBancaria_<BANCO>_<fecha>.xlsx
+    Con `origen` (ruta del extracto) se agrega su nombre, para que dos extractos
+    del mismo banco procesados en el mismo segundo no pisen el resultado.
+    """
+    banco_sanitizado = (banco.strip() or "Banco").replace(" ", "").upper()
+    fecha_str = datetime.now().strftime("%Y_%m_%d_%H%M%S")
+    if origen:
+        stem = re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.basename(origen))[0]).strip("_")
+        return f"ConciliacionBancaria_{banco_sanitizado}_{fecha_str}_{stem}{ext}"
+    return f"ConciliacionBancaria_{banco_sanitizado}_{fecha_str}{ext}"
+
+
+# ---------- resumen ----------
+class _Resumen:
+    """Acumula total / encontrados / no encontrados por pasada, lote a lote."""
+
+    def __init__(self):
+        self.por_pasada = {}
+
+    def agregar(self, lote: pd.DataFrame):
+        if "Encontrado" not in lote.columns or lote.empty:
+            return
+        encontrado = lote["Encontrado"].fillna(False).astype(bool)
+        if "Pasada" in lote.columns:
+            pasadas = lote["Pasada"].fillna("Sin coincidencia")
+        else:
+            pasadas = pd.Series(PASADA_EXACTA, index=lote.index)
+        conteo = encontrado.groupby(pasadas).agg(["size", "sum"])
+        for pasada, fila in conteo.iterrows():
+            total, enc = self.por_pasada.get(pasada, (0, 0))
+            self.por_pasada[pasada] = (total + int(fila["size"]), enc + int(fila["sum"]))
+
+    def filas(self):
+        yield ("Pasada", "Total", "Encontrados", "No encontrados")
+        total_gral = enc_gral = 0
+        for pasada, (total, enc) in self.por_pasada.items():
+            yield (pasada, total, enc, total - enc)
+            total_gral += total
+            enc_gral += enc
+        yield ("TOTAL", total_gral, enc_gral, total_gral - enc_gral)
+
+
+def calcular_resumen(resultado: pd.DataFrame) -> pd.DataFrame:
+    """Resumen total / encontrados / no encontrados por pasada."""
+    resumen = _Resumen()
+    resumen.agregar(resultado)
+    encabezado, *filas = resumen.filas()
+    return pd.DataFrame(filas, columns=list(encabezado))
+
+
+# ---------- xlsx en streaming ----------
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+# estilos: 0 = general, 1 = fecha (formato 14), 2 = fecha y hora (formato 22)
+_STYLES_XML = (
+    _XML_DECL
+    + f'<styleSheet xmlns="{_NS_MAIN}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_CELDA_VACIA = "<c/>"
+_EPOCA_EXCEL = np.datetime64("1899-12-30", "ns")
+_UN_DIA_NS = 86_400 * 10**9
+
+
+def _escapar_xml(s: pd.Series) -> pd.Series:
+    s = s.str.replace(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", regex=True)
+    return s.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+
+
+def _celdas_texto(s: pd.Series) -> np.ndarray:
+    nulos = s.isna().to_numpy()
+    texto = _escapar_xml(s.astype(str))
+    celdas = ('<c t="inlineStr"><is><t xml:space="preserve">' + texto + "</t></is></c>").to_numpy(dtype=object)
+    celdas[nulos] = _CELDA_VACIA
+    return celdas
+
+
+def _celdas_numero(s: pd.Series) -> np.ndarray:
+    valores = pd.to_numeric(s, errors="coerce").astype("float64")
+    validos = np.isfinite(valores.to_numpy())
+    texto = valores.map(repr) if valores.size else valores.astype(str)
+    # los enteros se escriben sin ".0"
+    texto = texto.str.replace(r"\.0$", "", regex=True)
+    celdas = ("<c><v>" + texto + "</v></c>").to_numpy(dtype=object)
+    celdas[~validos] = _CELDA_VACIA
+    return celdas
+
+
+def _celdas_bool(s: pd.Series) -> np.ndarray:
+    nulos = s.isna().to_numpy()
+    celdas = np.where(s.fillna(False).astype(bool).to_numpy(), '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>').astype(object)
+    celdas[nulos] = _CELDA_VACIA
+    return celdas
+
+
+def _celdas_fecha(s: pd.Series) -> np.ndarray:
+    fechas = pd.to_datetime(s, errors="coerce")
+    if getattr(fechas.dt, "tz", None) is not None:
+        fechas = fechas.dt.tz_localize(None)
+    ns = fechas.to_numpy(dtype="datetime64[ns]")
+    nulos = np.isnat(ns)
+    delta = (ns - _EPOCA_EXCEL).astype("int64")
+    dias, resto = np.divmod(delta, _UN_DIA_NS)
+    # solo fecha -> serial entero con formato fecha; con hora -> fracción y formato fecha-hora
+    con_hora = resto != 0
+    serial = pd.Series(dias.astype(str), dtype=object)
+    serial[con_hora] = pd.Series(delta[con_hora] / _UN_DIA_NS).map(repr).to_numpy()
+    estilo = np.where(con_hora, '<c s="2"><v>', '<c s="1"><v>')
+    celdas = (estilo.astype(object) + serial.to_numpy() + "</v></c>").astype(object)
+    celdas[nulos] = _CELDA_VACIA
+    return celdas
+
+
+def _celdas(s: pd.Series) -> np.ndarray:
+    """Arma el XML de las celdas de una columna, de forma vectorizada."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(object)
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return _celdas_bool(s)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return _celdas_fecha(s)
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return _celdas_numero(s)
+
+    tipo = pd.api.types.infer_dtype(s, skipna=True)
+    if tipo in ("date", "datetime", "datetime64"):
+        return _celdas_fecha(s)
+    if tipo in ("integer", "floating", "mixed-integer-float", "decimal"):
+        return _celdas_numero(s)
+    if tipo == "boolean":
+        return _celdas_bool(s)
+    if tipo == "empty":
+        return np.full(len(s), _CELDA_VACIA, dtype=object)
+    return _celdas_texto(s)
+
+
+def _xml_filas(lote: pd.DataFrame) -> str:
+    if lote.empty:
+        return ""
+    filas = np.full(len(lote), "<row>", dtype=object)
+    for col in lote.columns:
+        filas = filas + _celdas(lote[col])
+    return "".join(filas + "</row>")
+
+
+class _HojaStream:
+    """Hoja de un xlsx que se escribe fila a fila directo al zip."""
+
+    def __init__(self, zf: zipfile.ZipFile, indice: int):
+        self._f = zf.open(f"xl/worksheets/sheet{indice}.xml", "w", force_zip64=True)
+        self._escribir(_XML_DECL + f'<worksheet xmlns="{_NS_MAIN}"><sheetData>')
+
+    def _escribir(self, texto: str):
+        self._f.write(texto.encode("utf-8"))
+
+    def agregar(self, lote: pd.DataFrame):
+        self._escribir(_xml_filas(lote))
+
+    def cerrar(self):
+        self._escribir("</sheetData></worksheet>")
+        self._f.close()
+
+
+def _escribir_estructura(zf: zipfile.ZipFile, hojas: list[str]):
+    ct_hojas = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(hojas) + 1)
+    )
+    zf.writestr("[Content_Types].xml", (
+        _XML_DECL
+        + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        + ct_hojas + "</Types>"
+    ))
+    zf.writestr("_rels/.rels", (
+        _XML_DECL
+        + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ))
+    zf.writestr("xl/workbook.xml", (
+        _XML_DECL
+        + f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><sheets>'
+        + "".join(f'<sheet name="{n}" sheetId="{i}" r:id="rId{i}"/>' for i, n in enumerate(hojas, start=1))
+        + "</sheets></workbook>"
+    ))
+    zf.writestr("xl/_rels/workbook.xml.rels", (
+        _XML_DECL
+        + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        + "".join(
+            f'<Relationship Id="rId{i}" Type="{_NS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, len(hojas) + 1)
+        )
+        + f'<Relationship Id="rId{len(hojas) + 1}" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+        "</Relationships>"
+    ))
+    zf.writestr("xl/styles.xml", _STYLES_XML)
+
+
+# ---------- escritores ----------
+def escribir_xlsx(datos, ruta_salida: str) -> str:
+    resumen = _Resumen()
+
+    with zipfile.ZipFile(ruta_salida, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        _escribir_estructura(zf, [HOJA_COMPARACION, HOJA_RESUMEN])
+
+        hoja = _HojaStream(zf, 1)
+        encabezado_escrito = False
+        for lote in _lotes(datos):
+            if not encabezado_escrito:
+                hoja.agregar(pd.DataFrame([[str(c) for c in lote.columns]], dtype=object))
+                encabezado_escrito = True
+            resumen.agregar(lote)
+            hoja.agregar(lote)
+        hoja.cerrar()
+
+        hoja = _HojaStream(zf, 2)
+        encabezado, *filas = resumen.filas()
+        hoja.agregar(pd.DataFrame([encabezado], dtype=object))
+        hoja.agregar(pd.DataFrame(filas))
+        hoja.cerrar()
+
+    return ruta_salida
+
+
+def escribir_csv(datos, ruta_salida: str) -> str:
+    primero = True
+    for lote in _lotes(datos):
+        lote.to_csv(
+            ruta_salida,
+            mode="w" if primero else "a",
+            header=primero,
+            index=False,
+            encoding="utf-8-sig" if primero else "utf-8",
+        )
+        primero = False
+    return ruta_salida
+
+
+def escribir_parquet(datos, ruta_salida: str) -> str:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("La exportación a Parquet requiere pyarrow (pip install pyarrow).") from e
+
+    writer = None
+    try:
+        for lote in _lotes(datos):
+            tabla = pa.Table.from_pandas(lote, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(ruta_salida, tabla.schema)
+            writer.write_table(tabla.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return ruta_salida
+
+
+_ESCRITORES = {
+    "xlsx": escribir_xlsx,
+    "csv": escribir_csv,
+    "parquet": escribir_parquet,
+}
+
+
+def exportar(datos, ruta_salida: str, formato: str | None = None) -> str:
+    """
+    Exporta el resultado (DataFrame o iterable de lotes) según la extensión
+    de ruta_salida (.xlsx, .csv, .parquet) o el formato indicado.
+    """
+    formato = formato or formato_para(ruta_salida)
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    escritas = [0]
+    if isinstance(datos, pd.DataFrame):
+        datos = sin_columnas_internas(datos)
+        filas = escritas[0] = len(datos)
+    else:
+        filas = None
+        datos = _contar_lotes((sin_columnas_internas(lote) for lote in datos), escritas)
+    with etapa("exportacion", filas_entrada=filas, formato=formato) as reg:
+        ruta = _ESCRITORES[formato](datos, ruta_salida)
+        reg.filas_salida = escritas[0]
+        if filas is None:
+            reg.filas_entrada = escritas[0]
+        return ruta
+
+
+def _contar_lotes(lotes, contador: list):
+    """Deja pasar los lotes sumando sus filas en contador[0]."""
+    for lote in lotes:
+        contador[0] += len(lote)
+        yield lote
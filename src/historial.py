@@ -0,0 +1,205 @@
+# historial.py
+"""
+Historial persistente de movimientos ya conciliados.
+
+Los extractos que bajamos se solapan (un export de 90 días corrido cada semana
+repite ~80% de sus líneas). Guardamos una "huella" de cada línea del extracto
+(fecha, monto, descripción, saldo) junto con el resultado de la comparación,
+para descartar antes de comparar las líneas que ya se conciliaron en corridas
+anteriores y reportar solo las nuevas.
+"""
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+COLUMNA_HUELLA = "Huella"
+
+# Ubicación por defecto del historial (se puede cambiar con CONCILIACION_HISTORIAL)
+RUTA_HISTORIAL = os.environ.get(
+    "CONCILIACION_HISTORIAL",
+    str(Path.home() / ".conciliacion_bancaria" / "historial.sqlite"),
+)
+
+_SQL_CREAR = """
+    CREATE TABLE IF NOT EXISTS movimientos (
+        banco       TEXT    NOT NULL,
+        huella      INTEGER NOT NULL,
+        fecha       TEXT,
+        monto       REAL,
+        descripcion TEXT,
+        encontrado  INTEGER NOT NULL,
+        nro_trans   TEXT,
+        actualizado TEXT    NOT NULL,
+        PRIMARY KEY (banco, huella)
+    )
+"""
+
+
+# ---------- huellas ----------
+def _buscar_columna(df: pd.DataFrame, candidatos) -> str | None:
+    cols_lower = {c.lower(): c for c in df.columns}
+    for cand in candidatos:
+        if cand in cols_lower:
+            return cols_lower[cand]
+    return None
+
+
+def calcular_huellas(df_excel: pd.DataFrame) -> pd.Series:
+    """
+    Calcula una huella (int64) por línea del extracto a partir de
+    fecha, monto (crédito - débito), descripción y saldo.
+
+    Las líneas idénticas dentro del mismo extracto (mismo día, monto y texto,
+    sin saldo que las distinga) reciben huellas distintas según su orden de
+    aparición, para no colapsarlas en una sola.
+    """
+    fecha_col = _buscar_columna(df_excel, ["fecha"])
+    if not fecha_col:
+        raise ValueError("No se encontró la columna 'Fecha' en el DataFrame del Excel.")
+    deb_col = _buscar_columna(df_excel, ["débito", "debito"])
+    cred_col = _buscar_columna(df_excel, ["crédito", "credito"])
+    desc_col = _buscar_columna(df_excel, ["concepto", "descripción", "descripcion"])
+    saldo_col = _buscar_columna(df_excel, ["saldo"])
+
+    def _num(col):
+        if not col:
+            return 0
+        return pd.to_numeric(df_excel[col], errors="coerce").fillna(0)
+
+    # montos en centavos enteros para que la huella no dependa del redondeo float
+    monto = ((_num(cred_col) - _num(deb_col)) * 100).round()
+    claves = pd.DataFrame({
+        "fecha": pd.to_datetime(df_excel[fecha_col], errors="coerce").dt.strftime("%Y-%m-%d"),
+        "monto": pd.Series(monto, index=df_excel.index).astype("int64"),
+        "desc": df_excel[desc_col].astype(str).str.strip() if desc_col else "",
+        "saldo": (_num(saldo_col) * 100).round().astype("int64") if saldo_col else 0,
+    }, index=df_excel.index)
+
+    base = pd.util.hash_pandas_object(claves, index=False)
+    ocurrencia = base.groupby(base).cumcount()
+    huellas = pd.util.hash_pandas_object(
+        pd.DataFrame({"base": base, "ocurrencia": ocurrencia}), index=False
+    )
+    # sqlite guarda enteros con signo de 64 bits
+    return pd.Series(huellas.to_numpy().view(np.int64), index=df_excel.index, name=COLUMNA_HUELLA)
+
+
+# ---------- persistencia ----------
+def _conectar(ruta: str | None = None) -> sqlite3.Connection:
+    ruta = ruta or RUTA_HISTORIAL
+    Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(ruta)
+    con.execute(_SQL_CREAR)
+    return con
+
+
+def filtrar_conciliados(df_excel: pd.DataFrame, banco: str, ruta: str | None = None) -> tuple[pd.DataFrame, int]:
+    """
+    Agrega la columna 'Huella' al extracto y descarta las líneas que ya
+    fueron conciliadas (Encontrado = True) en corridas anteriores del mismo banco.
+
+    Devuelve:
+        (df_nuevos, cantidad_descartada)
+    """
+    huellas = calcular_huellas(df_excel)
+    df = df_excel.assign(**{COLUMNA_HUELLA: huellas})
+
+    con = _conectar(ruta)
+    try:
+        previas = np.fromiter(
+            (h for (h,) in con.execute(
+                "SELECT huella FROM movimientos WHERE banco = ? AND encontrado = 1", (banco,)
+            )),
+            dtype=np.int64,
+        )
+    finally:
+        con.close()
+
+    if len(previas) == 0:
+        return df, 0
+
+    ya_conciliados = np.isin(huellas.to_numpy(), previas)
+    return df[~ya_conciliados].reset_index(drop=True), int(ya_conciliados.sum())
+
+
+def nro_trans_conciliados(banco: str, ruta: str | None = None) -> list[str]:
+    """
+    nro_trans de los asientos que el historial ya usó para conciliar líneas
+    del banco. Siguen con conciliado = FALSE en la BD hasta que se marcan,
+    pero no están libres para otras líneas.
+    """
+    con = _conectar(ruta)
+    try:
+        return [n for (n,) in con.execute(
+            "SELECT DISTINCT nro_trans FROM movimientos "
+            "WHERE banco = ? AND encontrado = 1 AND nro_trans IS NOT NULL ORDER BY nro_trans",
+            (banco,),
+        )]
+    finally:
+        con.close()
+
+
+def registrar(df_comparacion: pd.DataFrame, banco: str, ruta: str | None = None) -> int:
+    """
+    Guarda (o actualiza) el resultado de cada línea comparada.
+    Requiere las columnas 'Huella' y 'Encontrado' del resultado de comparador.comparar.
+    Devuelve la cantidad de líneas registradas.
+    """
+    if COLUMNA_HUELLA not in df_comparacion.columns:
+        return 0
+
+    def _valores(serie: pd.Series | None) -> list:
+        if serie is None:
+            return [None] * len(df_comparacion)
+        serie = serie.astype(object)
+        return serie.where(serie.notna(), None).tolist()
+
+    def _col(nombre):
+        return df_comparacion[nombre] if nombre in df_comparacion.columns else None
+
+    def _texto(v):
+        if v is None:
+            return None
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        return str(v)
+
+    fechas = _col("Fecha_Excel")
+    if fechas is not None:
+        fechas = pd.to_datetime(fechas, errors="coerce").dt.strftime("%Y-%m-%d")
+    montos = _col("Monto_Excel")
+    if montos is not None:
+        montos = pd.to_numeric(montos, errors="coerce")
+
+    ahora = datetime.now().isoformat(timespec="seconds")
+    filas = zip(
+        df_comparacion[COLUMNA_HUELLA].astype("int64").tolist(),
+        _valores(fechas),
+        _valores(montos),
+        _valores(_col("Descripcion")),
+        df_comparacion["Encontrado"].fillna(False).astype(bool).tolist(),
+        _valores(_col("nro_trans")),
+    )
+
+    con = _conectar(ruta)
+    try:
+        with con:
+            con.executemany(
+                """
+                INSERT INTO movimientos (banco, huella, fecha, monto, descripcion, encontrado, nro_trans, actualizado)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (banco, huella) DO UPDATE SET
+                    encontrado  = MAX(movimientos.encontrado, excluded.encontrado),
+                    nro_trans   = COALESCE(excluded.nro_trans, movimientos.nro_trans),
+                    actualizado = excluded.actualizado
+                """,
+                ((banco, h, f, m, d, int(e), _texto(n) if e else None, ahora) for h, f, m, d, e, n in filas),
+            )
+    finally:
+        con.close()
+
+    return len(df_comparacion)
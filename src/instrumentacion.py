@@ -0,0 +1,200 @@
+# instrumentacion.py
+"""
+Instrumentación por etapa del pipeline (lectura, detección de encabezado,
+normalización, BD, comparación, exportación).
+
+Cada etapa registra: tiempo de pared, filas de entrada y de salida y pico de
+memoria (tracemalloc). Los registros van a un "sumidero" intercambiable:
+    - SumideroJSONL(ruta_o_stream): una línea JSON por etapa.
+    - SumideroLista(): los guarda en memoria (útil en scripts y benchmarks).
+    - cualquier callable(registro: dict).
+
+Apagada (por defecto) cuesta una comprobación y un context manager vacío.
+Se activa con configurar(sumidero) o con la variable de entorno
+CONCILIACION_TRAZA=<ruta.jsonl | "-" para stderr>.
+
+Uso:
+    with etapa("lectura", archivo=ruta) as reg:
+        df = leer(...)
+        reg.filas_salida = len(df)
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+_sumidero = None
+_memoria = False
+_tracemalloc_propio = False  # configurar() lo prendió (y por eso puede apagarlo)
+_local = threading.local()
+
+
+class Registro:
+    __slots__ = ("etapa", "filas_entrada", "filas_salida", "extra", "_base", "_pico")
+
+    def __init__(self, nombre: str, filas_entrada: int | None, extra: dict):
+        self.etapa = nombre
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+        self.extra = extra
+        self._base = 0   # memoria trazada al empezar la etapa
+        self._pico = 0   # pico absoluto visto (incluye el de sub-etapas)
+
+
+class _RegistroNulo:
+    """
+    Lo que devuelve etapa() con la instrumentación apagada: un context manager
+    reutilizable que ignora todo (no crea objetos ni mide nada).
+    """
+    __slots__ = ()
+
+    def __setattr__(self, nombre, valor):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _RegistroNulo()
+
+
+# ---------- sumideros ----------
+class SumideroJSONL:
+    """Escribe un registro JSON por línea en un archivo o stream."""
+
+    def __init__(self, destino):
+        self._lock = threading.Lock()
+        if isinstance(destino, (str, os.PathLike)):
+            self._f = open(destino, "a", encoding="utf-8")
+            self._propio = True
+        else:
+            self._f = destino
+            self._propio = False
+
+    def __call__(self, registro: dict):
+        linea = json.dumps(registro, ensure_ascii=False, default=str)
+        with self._lock:
+            self._f.write(linea + "\n")
+            self._f.flush()
+
+    def cerrar(self):
+        if self._propio:
+            self._f.close()
+
+
+class SumideroLista:
+    """Acumula los registros en memoria (self.registros)."""
+
+    def __init__(self):
+        self.registros = []
+
+    def __call__(self, registro: dict):
+        self.registros.append(registro)
+
+
+# ---------- configuración ----------
+def configurar(sumidero=None, memoria: bool = True):
+    """
+    Activa la instrumentación con el sumidero dado (None la apaga).
+    memoria=True mide picos con tracemalloc (agrega overhead mientras está activa).
+    """
+    global _sumidero, _memoria, _tracemalloc_propio
+    _sumidero = sumidero
+    _memoria = sumidero is not None and memoria
+    if _memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracemalloc_propio = True
+    elif not _memoria and _tracemalloc_propio:
+        # solo se apaga si lo prendimos acá: no le cortamos la traza a quien la usaba
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _tracemalloc_propio = False
+
+
+def activa() -> bool:
+    return _sumidero is not None
+
+
+def _desde_entorno():
+    destino = os.environ.get("CONCILIACION_TRAZA")
+    if destino:
+        configurar(SumideroJSONL(sys.stderr if destino == "-" else destino))
+
+
+# ---------- etapas ----------
+def _pila() -> list:
+    pila = getattr(_local, "pila", None)
+    if pila is None:
+        pila = _local.pila = []
+    return pila
+
+
+@contextlib.contextmanager
+def _medir(nombre: str, filas_entrada: int | None, extra: dict):
+    reg = Registro(nombre, filas_entrada, extra)
+    pila = _pila()
+    padre = pila[-1] if pila else None
+
+    if _memoria:
+        # el pico registrado hasta acá es del padre: se lo anotamos y reseteamos
+        actual, pico = tracemalloc.get_traced_memory()
+        if padre is not None:
+            padre._pico = max(padre._pico, pico)
+        tracemalloc.reset_peak()
+        reg._base = actual
+
+    pila.append(reg)
+    inicio = time.perf_counter()
+    error = None
+    try:
+        yield reg
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        pila.pop()
+
+        registro = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "etapa": nombre,
+            "segundos": round(segundos, 6),
+            "filas_entrada": reg.filas_entrada,
+            "filas_salida": reg.filas_salida,
+        }
+        if _memoria:
+            reg._pico = max(reg._pico, tracemalloc.get_traced_memory()[1])
+            registro["pico_memoria_mb"] = round((reg._pico - reg._base) / 2**20, 3)
+            if padre is not None:
+                padre._pico = max(padre._pico, reg._pico)
+        if padre is not None:
+            registro["padre"] = padre.etapa
+        if error:
+            registro["error"] = error
+        registro.update(reg.extra)
+
+        sumidero = _sumidero
+        if sumidero is not None:
+            sumidero(registro)
+
+
+def etapa(nombre: str, filas_entrada: int | None = None, **extra):
+    """
+    Context manager que mide una etapa. Dentro del bloque se puede asignar
+    `reg.filas_salida` (y filas_entrada si no se conocía al empezar).
+    """
+    if _sumidero is None:
+        return _NULO
+    return _medir(nombre, filas_entrada, extra)
+
+
+_desde_entorno()
@@ -1,8 +1,8 @@
 import os
+import threading
 import unicodedata
 import re
 import pandas as pd
-from openpyxl import load_workbook
 from pathlib import Path
 from datetime import datetime
 
@@ -11,6 +11,9 @@ COLUMNAS_ESPERADAS = [
     "Asunto", "Dependencia", "Débito", "Crédito"
 ]
 
+# texto repetitivo: se guarda como category si conviene (ver columnar.py)
+COLUMNAS_TEXTO = ["Descripción", "Número de documento", "Asunto", "Dependencia"]
+
 # ---- utilidades ----
 def _strip_accents(s: str) -> str:
     return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
@@ -18,6 +21,9 @@ def _strip_accents(s: str) -> str:
 import pandas as pd
 from pandas.api import types as pdt
 
+import columnar
+from instrumentacion import etapa
+
 def _normalize_amount(series: pd.Series) -> pd.Series:
     """
     Normaliza montos con formato latino:
@@ -142,7 +148,32 @@ def _ensure_xlsx(path: str) -> str:
     return path
 
 # ---- detección de encabezados ----
+# Layouts ya vistos: (fila de encabezado, encabezados normalizados) -> col_map.
+# Si la misma fila del archivo nuevo coincide, no se vuelve a buscar.
+# El servicio y el vigilante leen desde varios hilos: se toca siempre con el lock.
+_LAYOUTS_APRENDIDOS = {}
+_LOCK_LAYOUTS = threading.Lock()
+MAX_LAYOUTS = 8
+
+
 def _find_header_row_and_colmap(rows) -> tuple[int, dict] | tuple[None, None]:
+    with _LOCK_LAYOUTS:
+        layouts = list(_LAYOUTS_APRENDIDOS.items())
+    for (i, firma), col_map in layouts:
+        if i < len(rows) and tuple(_norm_header(v) for v in rows[i]) == firma:
+            return i, col_map
+
+    i, col_map = _detectar_encabezado(rows)
+    if i is not None:
+        firma = tuple(_norm_header(v) for v in rows[i])
+        with _LOCK_LAYOUTS:
+            if len(_LAYOUTS_APRENDIDOS) >= MAX_LAYOUTS:
+                _LAYOUTS_APRENDIDOS.pop(next(iter(_LAYOUTS_APRENDIDOS)))
+            _LAYOUTS_APRENDIDOS[(i, firma)] = col_map
+    return i, col_map
+
+
+def _detectar_encabezado(rows) -> tuple[int, dict] | tuple[None, None]:
     for i, r in enumerate(rows):
         norm_cells = [_norm_header(v) for v in r]
         col_map = {}
@@ -165,9 +196,12 @@ def _build_table_from_header(rows, header_idx: int, col_map: dict) -> pd.DataFra
     for vals in data_rows:
         if _is_footer_row(vals):
             break
-        if all((vals[col_map[c]] is None if c in col_map else True) for c in col_map.keys()):
+        # filas cortas (p. ej. filas vacías en modo read_only) se tratan como celdas vacías
+        if all((vals[col_map[c]] is None if c in col_map and col_map[c] < len(vals) else True)
+               for c in col_map.keys()):
             continue
-        registro = {col: vals[col_map[col]] if col in col_map else None for col in COLUMNAS_ESPERADAS}
+        registro = {col: (vals[col_map[col]] if col in col_map and col_map[col] < len(vals) else None)
+                    for col in COLUMNAS_ESPERADAS}
         registros.append(registro)
 
     if not registros:
@@ -175,13 +209,15 @@ def _build_table_from_header(rows, header_idx: int, col_map: dict) -> pd.DataFra
 
     df = pd.DataFrame(registros)
 
-    if "Fecha" in df.columns:
-        df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce", dayfirst=True)
-        df = df.dropna(subset=["Fecha"])
+    with etapa("normalizacion", filas_entrada=len(df)) as reg:
+        if "Fecha" in df.columns:
+            df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce", dayfirst=True)
+            df = df.dropna(subset=["Fecha"])
 
-    for col in ["Débito", "Crédito"]:
-        if col in df.columns:
-            df[col] = _normalize_amount(df[col])
+        for col in ["Débito", "Crédito"]:
+            if col in df.columns:
+                df[col] = _normalize_amount(df[col])
+        reg.filas_salida = len(df)
 
     for c in COLUMNAS_ESPERADAS:
         if c not in df.columns:
@@ -191,16 +227,27 @@ def _build_table_from_header(rows, header_idx: int, col_map: dict) -> pd.DataFra
 
 # ---- función principal ----
 def leer_movimientos_brou(path_in: str) -> pd.DataFrame:
+    with etapa("lectura", banco="BROU", archivo=os.path.basename(path_in)) as reg:
+        df = columnar.compactar_texto(_leer_movimientos_brou(path_in), COLUMNAS_TEXTO)
+        reg.filas_salida = len(df)
+    return df
+
+def _leer_movimientos_brou(path_in: str) -> pd.DataFrame:
     ruta = _ensure_xlsx(path_in)
+    from openpyxl import load_workbook  # solo lo importa quien lee un archivo
+
     wb = load_workbook(ruta, read_only=True, data_only=True)
     bloques = []
 
     for ws in wb.worksheets:
-        rows = list(ws.iter_rows(values_only=True))
+        with etapa("lectura_excel", hoja=ws.title) as reg:
+            rows = list(ws.iter_rows(values_only=True))
+            reg.filas_salida = len(rows)
         if not rows:
             continue
 
-        header_idx, col_map = _find_header_row_and_colmap(rows)
+        with etapa("deteccion_encabezado", hoja=ws.title):
+            header_idx, col_map = _find_header_row_and_colmap(rows)
         if header_idx is not None:
             df_blk = _build_table_from_header(rows, header_idx, col_map)
             if not df_blk.empty:
@@ -218,7 +265,6 @@ def procesar_brou(ruta: str):
     """
     df = leer_movimientos_brou(ruta)
     print(f"✅ Procesado archivo BROU ({len(df)} filas).")
-    print(df.head())
     return df
 
 # ---- Ejemplo de uso manual ----
@@ -1,17 +1,24 @@
 import os
 import re
+import threading
 import unicodedata
 from pathlib import Path
 from datetime import datetime
 from pandas.api import types as pdt
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
+
+import columnar
+from instrumentacion import etapa
 
 # ---- columnas objetivo (estándar Itaú) ----
 COLUMNAS_ESPERADAS = [
     "Fecha", "Concepto", "Débito", "Crédito", "Saldo", "Referencia", "Destino"
 ]
 
+# texto repetitivo: se guarda como category si conviene (ver columnar.py)
+COLUMNAS_TEXTO = ["Concepto", "Referencia", "Destino"]
+
 # ---------- utilidades ----------
 def _strip_accents(s: str) -> str:
     return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
@@ -131,53 +138,88 @@ def _ensure_xlsx(path: str) -> str:
     return path
 
 # ---------- paso A: método rápido con pandas ----------
-def _try_pandas_header_detection(ruta_xlsx: str) -> pd.DataFrame | None:
-    # 1) localizar fila con "fecha"
-    df_raw = pd.read_excel(ruta_xlsx, header=None, engine="openpyxl")
-    header_row = None
-    for i, fila in df_raw.iterrows():
-        if fila.astype(str).str.contains(r"(?i)\bfecha\b", na=False).any():
-            header_row = i
-            break
-    if header_row is None:
-        return None
-
-    # 2) leer con esa fila como encabezado
-    df = pd.read_excel(ruta_xlsx, header=header_row, engine="openpyxl")
+# Layouts ya vistos: (fila de encabezado, encabezados normalizados) -> {estándar: posición}.
+# Los extractos de un mismo banco casi siempre traen el mismo layout: si la
+# fila recordada coincide, se saltea la detección y el mapeo por regex.
+# El servicio y el vigilante leen desde varios hilos: se toca siempre con el lock.
+_LAYOUTS_APRENDIDOS = {}
+_LOCK_LAYOUTS = threading.Lock()
+MAX_LAYOUTS = 8
 
-    # 3) normalizar nombres y mapear por regex
-    original_cols = list(df.columns)
-    norm_cols = [_norm_header(c) for c in original_cols]
 
+def _mapear_encabezados(norm_cols: list[str]) -> dict:
     mapped = {}
-    used = set()
     for idx, ncol in enumerate(norm_cols):
         for pattern, std in HEADER_REGEX_MAP:
             if re.search(pattern, ncol):
                 if std not in mapped:  # primera coincidencia gana
-                    mapped[std] = original_cols[idx]
-                    used.add(idx)
+                    mapped[std] = idx
                 break  # pasa a la siguiente columna
+    return mapped
+
+
+def _layout_recordado(df_raw: pd.DataFrame):
+    with _LOCK_LAYOUTS:
+        layouts = list(_LAYOUTS_APRENDIDOS.items())
+    for (fila, firma), mapped in layouts:
+        if fila < len(df_raw) and tuple(_norm_header(v) for v in df_raw.iloc[fila]) == firma:
+            return fila, mapped
+    return None, None
+
+
+def _try_pandas_header_detection(ruta_xlsx: str) -> pd.DataFrame | None:
+    # 1) leer la hoja una sola vez, sin encabezado
+    with etapa("lectura_excel") as reg:
+        df_raw = pd.read_excel(ruta_xlsx, header=None, engine="openpyxl")
+        reg.filas_salida = len(df_raw)
+
+    # 2) localizar fila con "fecha" (o reusar un layout ya aprendido)
+    with etapa("deteccion_encabezado", metodo="pandas"):
+        header_row, mapped = _layout_recordado(df_raw)
+        if header_row is None:
+            for i, fila in enumerate(df_raw.itertuples(index=False)):
+                if pd.Series(fila, dtype=object).astype(str).str.contains(r"(?i)\bfecha\b", na=False).any():
+                    header_row = i
+                    break
+    if header_row is None:
+        return None
+
+    # 3) normalizar nombres y mapear por regex (posición de cada columna estándar)
+    firma = tuple(_norm_header(v) for v in df_raw.iloc[header_row])
+    if mapped is None:
+        mapped = _mapear_encabezados([
+            _norm_header(v) if pd.notna(v) else f"unnamed: {j}" for j, v in enumerate(df_raw.iloc[header_row])
+        ])
+
+    # las filas de datos salen del mismo df_raw (sin releer el archivo)
+    df = df_raw.iloc[header_row + 1:].infer_objects()
 
     # criterios de aceptación relajados:
     must_have = ("Fecha",)
     amount_any = any(k in mapped for k in ("Débito", "Crédito", "Saldo"))
     if all(k in mapped for k in must_have) and amount_any:
         # construir dataframe final con las columnas estándar (faltantes como NA)
-        out = pd.DataFrame()
+        with _LOCK_LAYOUTS:
+            if len(_LAYOUTS_APRENDIDOS) >= MAX_LAYOUTS:
+                _LAYOUTS_APRENDIDOS.pop(next(iter(_LAYOUTS_APRENDIDOS)))
+            _LAYOUTS_APRENDIDOS[(header_row, firma)] = mapped
+
+        out = pd.DataFrame(index=df.index)
         for c in COLUMNAS_ESPERADAS:
             if c in mapped:
-                out[c] = df[mapped[c]]
+                out[c] = df.iloc[:, mapped[c]]
             else:
                 out[c] = pd.NA
 
         # tipos
-        out["Fecha"] = pd.to_datetime(out["Fecha"], errors="coerce", dayfirst=True)
-        out = out.dropna(subset=["Fecha"]).reset_index(drop=True)
+        with etapa("normalizacion", filas_entrada=len(out)) as reg:
+            out["Fecha"] = pd.to_datetime(out["Fecha"], errors="coerce", dayfirst=True)
+            out = out.dropna(subset=["Fecha"]).reset_index(drop=True)
 
-        for col in ["Débito", "Crédito", "Saldo"]:
-            if col in out.columns:
-                out[col] = _normalize_amount(out[col])
+            for col in ["Débito", "Crédito", "Saldo"]:
+                if col in out.columns:
+                    out[col] = _normalize_amount(out[col])
+            reg.filas_salida = len(out)
 
         return out[COLUMNAS_ESPERADAS]
 
@@ -261,13 +303,15 @@ def _table_from_fused_header(ws, header_start: int, fused_headers: list[str]) ->
     df = pd.DataFrame(registros)
 
     # tipos
-    if "Fecha" in df.columns:
-        df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce", dayfirst=True)
-        df = df.dropna(subset=["Fecha"])
+    with etapa("normalizacion", filas_entrada=len(df)) as reg:
+        if "Fecha" in df.columns:
+            df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce", dayfirst=True)
+            df = df.dropna(subset=["Fecha"])
 
-    for col in ["Débito", "Crédito", "Saldo"]:
-        if col in df.columns:
-            df[col] = _normalize_amount(df[col])
+        for col in ["Débito", "Crédito", "Saldo"]:
+            if col in df.columns:
+                df[col] = _normalize_amount(df[col])
+        reg.filas_salida = len(df)
 
     # asegurar orden
     for c in COLUMNAS_ESPERADAS:
@@ -278,6 +322,12 @@ def _table_from_fused_header(ws, header_start: int, fused_headers: list[str]) ->
 
 # ---------- API de lectura ----------
 def leer_movimientos_itau(path_in: str) -> pd.DataFrame:
+    with etapa("lectura", banco="Itaú", archivo=os.path.basename(path_in)) as reg:
+        df = columnar.compactar_texto(_leer_movimientos_itau(path_in), COLUMNAS_TEXTO)
+        reg.filas_salida = len(df)
+    return df
+
+def _leer_movimientos_itau(path_in: str) -> pd.DataFrame:
     ruta = _ensure_xlsx(path_in)
 
     # Paso A: intento rápido con pandas
@@ -289,11 +339,14 @@ def leer_movimientos_itau(path_in: str) -> pd.DataFrame:
         pass  # seguimos al paso B
 
     # Paso B: openpyxl + fusión de filas de encabezado
+    from openpyxl import load_workbook  # solo lo importa quien lee un archivo
+
     wb = load_workbook(ruta, read_only=True, data_only=True)
     bloques = []
 
     for ws in wb.worksheets:
-        start, fused = _find_header_by_row_fusion(ws)
+        with etapa("deteccion_encabezado", metodo="fusion", hoja=ws.title):
+            start, fused = _find_header_by_row_fusion(ws)
         if start is not None:
             df_blk = _table_from_fused_header(ws, start, fused)
             if not df_blk.empty:
@@ -304,14 +357,97 @@ def leer_movimientos_itau(path_in: str) -> pd.DataFrame:
 
     return pd.concat(bloques, ignore_index=True).dropna(how="all").reset_index(drop=True)
 
+# ---------- continuidad de saldos ----------
+COLUMNA_SALDO_OK = "Saldo_OK"
+
+
+def _cadena_saldos(saldo, mov, saldo_anterior, descendente: bool):
+    """Saldo esperado de cada fila según la anterior (arrays int64 en centavos)."""
+    esperado = np.empty_like(saldo)
+    if descendente:
+        # lo más nuevo primero: saldo[i] = saldo[i-1] - mov[i-1]
+        esperado[1:] = saldo[:-1] - mov[:-1]
+    else:
+        # cronológico: saldo[i] = saldo[i-1] + mov[i]
+        esperado[1:] = saldo[:-1] + mov[1:]
+    if len(saldo):
+        esperado[0] = (saldo_anterior if descendente else saldo_anterior + mov[0]) if saldo_anterior is not None else 0
+    return esperado
+
+
+def verificar_saldos(df: pd.DataFrame, saldo_anterior: int | None = None, orden: str = "auto") -> tuple[pd.Series, int | None]:
+    """
+    Verifica que el saldo encadene fila a fila: saldo anterior + crédito - débito
+    == saldo, en centavos enteros. Es O(n) y vectorizado.
+
+    Devuelve (ok, arrastre):
+      - ok: Serie booleana (nullable) alineada con df; False marca la fila donde
+        se corta la cadena (falta o sobra una línea justo antes). NA si la fila
+        no tiene saldo o no hay fila anterior contra la cual comparar.
+      - arrastre: el `saldo_anterior` a pasar al verificar el lote siguiente
+        del mismo extracto (lecturas por partes).
+
+    orden: "asc" (cronológico), "desc" (lo más nuevo primero) o "auto" (el
+    sentido en que encadenan más filas).
+    """
+    if df.empty or "Saldo" not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="boolean", name=COLUMNA_SALDO_OK), saldo_anterior
+
+    def _cent(col):
+        if col not in df.columns:
+            return np.zeros(len(df), dtype=np.int64)
+        return columnar.a_centavos(df[col]).fillna(0).to_numpy(dtype=np.int64)
+
+    mov = _cent("Crédito") - _cent("Débito")
+    saldo_cent = columnar.a_centavos(df["Saldo"])
+    sin_saldo = saldo_cent.isna().to_numpy()
+    saldo = saldo_cent.fillna(0).to_numpy(dtype=np.int64)
+
+    # una fila es verificable si ella y la anterior tienen saldo
+    verificable = ~sin_saldo
+    verificable[1:] &= ~sin_saldo[:-1]
+    if saldo_anterior is None:
+        verificable[:1] = False
+
+    def _ok(descendente):
+        return (saldo == _cadena_saldos(saldo, mov, saldo_anterior, descendente)) & verificable
+
+    if orden == "auto":
+        ok_asc, ok_desc = _ok(False), _ok(True)
+        descendente = ok_desc.sum() > ok_asc.sum()
+        ok = ok_desc if descendente else ok_asc
+    else:
+        descendente = orden == "desc"
+        ok = _ok(descendente)
+
+    resultado = pd.Series(pd.array(ok, dtype="boolean"), index=df.index, name=COLUMNA_SALDO_OK)
+    resultado[~verificable] = pd.NA
+
+    arrastre = saldo_anterior
+    if not sin_saldo[-1]:
+        arrastre = int(saldo[-1] - mov[-1]) if descendente else int(saldo[-1])
+    return resultado, arrastre
+
+
 # ---------- API para main.py ----------
 def procesar_itau(ruta: str):
     """
     Procesa un archivo Itaú y devuelve un DataFrame.
+    Agrega Saldo_OK (continuidad del saldo) y avisa dónde se corta la cadena.
     """
     df = leer_movimientos_itau(ruta)
     print(f"✅ Procesado archivo Itaú ({len(df)} filas).")
-    print(df.head())
+
+    with etapa("verificacion_saldos", filas_entrada=len(df)) as reg:
+        ok, _ = verificar_saldos(df)
+        df[COLUMNA_SALDO_OK] = ok
+        cortes = df.index[ok.eq(False).fillna(False).to_numpy(dtype=bool)]
+        reg.filas_salida = len(cortes)
+    if len(cortes):
+        print(f"⚠️ El saldo no encadena en {len(cortes)} filas (posible línea faltante o duplicada):")
+        for i in cortes[:5]:
+            fila = df.loc[i]
+            print(f"   movimiento {i + 1}: {fila['Fecha']:%d/%m/%Y} {fila['Concepto']} saldo {fila['Saldo']}")
     return df
 
 # ---- prueba manual ----
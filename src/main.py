@@ -2,14 +2,21 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-from datetime import datetime  # <-- agregado
-import pandas as pd
+import queue
+import threading
 
-# Módulos propios
-import lectorItau
-import lectorBrou
-import db
-import comparador
+# Los módulos propios (y con ellos pandas, openpyxl y SQLAlchemy) se importan
+# dentro de cada paso: la ventana aparece sin esperar a las dependencias pesadas.
+
+# cada cuánto (ms) la UI vacía la cola de mensajes del worker
+INTERVALO_COLA_MS = 100
+
+ETAPAS = {
+    "lectura": (1, "Leyendo extracto", "filas leídas"),
+    "historial": (2, "Descartando ya conciliados", "filas nuevas"),
+    "bd": (3, "Consultando BD", "filas traídas"),
+    "comparacion": (4, "Comparando", "filas comparadas"),
+}
 
 
 class ComparadorApp:
@@ -18,12 +25,22 @@ class ComparadorApp:
         self.df_excel = None
         self.df_bd = None
         self.df_comparacion = None
+        self.cache_comparaciones = None  # comparador.CacheComparaciones (se crea al comparar)
+        self._trabajo = None  # puntos_control.Trabajo a borrar cuando se exporte el resultado
+        self._corrida = None  # última corrida: se confirma en el historial al exportarla
+
+        # Comunicación worker -> UI: el worker solo encola, la UI consume con root.after
+        self._cola = queue.Queue()
+        self._cancelar = threading.Event()
+        self._worker = None
+
         self._build_ui()
+        self.root.after(INTERVALO_COLA_MS, self._drenar_cola)
 
     # ---------------- UI ----------------
     def _build_ui(self):
         self.root.title("Comparador de Estados de Cuenta vs Base de Datos")
-        self.root.geometry("800x550")
+        self.root.geometry("800x600")
         self.root.resizable(True, True)
 
         main = ttk.Frame(self.root, padding=16)
@@ -47,8 +64,20 @@ class ComparadorApp:
         actions = ttk.LabelFrame(main, text="2) Procesamiento y comparación", padding=12)
         actions.pack(fill="x", pady=(0, 10))
 
-        ttk.Button(actions, text="Procesar y Comparar", command=self.procesar_y_comparar).grid(row=0, column=0, padx=4, pady=4)
-        ttk.Button(actions, text="Exportar coincidencias", command=self.exportar_comparacion).grid(row=0, column=1, padx=4, pady=4)
+        self.btn_procesar = ttk.Button(actions, text="Procesar y Comparar", command=self.procesar_y_comparar)
+        self.btn_procesar.grid(row=0, column=0, padx=4, pady=4)
+        self.btn_cancelar = ttk.Button(actions, text="Cancelar", command=self.cancelar, state="disabled")
+        self.btn_cancelar.grid(row=0, column=1, padx=4, pady=4)
+        self.btn_exportar = ttk.Button(actions, text="Exportar coincidencias", command=self.exportar_comparacion)
+        self.btn_exportar.grid(row=0, column=2, padx=4, pady=4)
+        self.btn_ver = ttk.Button(actions, text="Ver resultados", command=self.ver_resultados)
+        self.btn_ver.grid(row=0, column=3, padx=4, pady=4)
+
+        # --- Progreso por etapa ---
+        self.barra_progreso = ttk.Progressbar(actions, maximum=len(ETAPAS), mode="determinate", length=300)
+        self.barra_progreso.grid(row=1, column=0, columnspan=2, sticky="we", padx=4, pady=(6, 0))
+        self.label_progreso = ttk.Label(actions, text="")
+        self.label_progreso.grid(row=1, column=2, columnspan=2, sticky="w", padx=4, pady=(6, 0))
 
         # --- Resultados / Log ---
         results = ttk.LabelFrame(main, text="Resultados", padding=12)
@@ -60,11 +89,47 @@ class ComparadorApp:
 
     # -------------- Utilidades --------------
     def log(self, mensaje: str):
+        # Seguro desde cualquier hilo: se muestra en el próximo drenado de la cola
+        self._cola.put(("log", mensaje))
+
+    def _escribir_log(self, mensajes: list[str]):
         self.text_resultados.configure(state="normal")
-        self.text_resultados.insert(tk.END, f"{mensaje}\n")
+        self.text_resultados.insert(tk.END, "".join(f"{m}\n" for m in mensajes))
         self.text_resultados.see(tk.END)
         self.text_resultados.configure(state="disabled")
-        self.root.update_idletasks()
+
+    def _drenar_cola(self):
+        """Consume los mensajes del worker en lote (un solo insert por tick)."""
+        mensajes = []
+        try:
+            while True:
+                tipo, *datos = self._cola.get_nowait()
+                if tipo == "log":
+                    mensajes.append(datos[0])
+                elif tipo == "progreso":
+                    self._mostrar_progreso(*datos)
+                elif tipo == "fin":
+                    if mensajes:
+                        self._escribir_log(mensajes)
+                        mensajes = []
+                    try:
+                        self._terminar(*datos)
+                    except Exception as e:
+                        # un error mostrando el resultado no puede dejar la cola sin drenar
+                        mensajes.append(f"❌ Error mostrando el resultado: {e}")
+        except queue.Empty:
+            pass
+        finally:
+            # siempre se reprograma: si no, la GUI deja de recibir mensajes del worker
+            self.root.after(INTERVALO_COLA_MS, self._drenar_cola)
+
+        if mensajes:
+            self._escribir_log(mensajes)
+
+    def _mostrar_progreso(self, etapa: str, filas: int):
+        orden, titulo, unidad = ETAPAS.get(etapa, (0, etapa, "filas"))
+        self.barra_progreso["value"] = orden - 1 if filas == 0 else orden
+        self.label_progreso.configure(text=f"{titulo}: {filas:,} {unidad}".replace(",", "."))
 
     def seleccionar_archivo(self):
         ruta = filedialog.askopenfilename(
@@ -77,101 +142,143 @@ class ComparadorApp:
 
     # -------------- Flujo principal --------------
     def procesar_y_comparar(self):
-        if not self.procesar_archivo():
-            return
-        if not self.consultar_bd():
+        if self._worker is not None and self._worker.is_alive():
             return
-        self.comparar_datos()
 
-    # ----------------- LECTURA EXCEL -----------------
-    def procesar_archivo(self):
         ruta = self.entrada_archivo.get().strip()
         tipo = self.combo_tipo.get().strip()
 
         if not ruta or not os.path.exists(ruta):
             messagebox.showerror("Error", "Seleccioná un archivo válido.")
-            return False
+            return
 
         self.log(f"📁 Procesando archivo: {ruta}")
-
+        self._cancelar.clear()
+        self.btn_procesar.configure(state="disabled")
+        self.btn_exportar.configure(state="disabled")
+        self.btn_ver.configure(state="disabled")
+        self.btn_cancelar.configure(state="normal")
+        self.barra_progreso["value"] = 0
+
+        if self.cache_comparaciones is None:
+            import comparador
+            self.cache_comparaciones = comparador.CacheComparaciones()
+
+        self._worker = threading.Thread(target=self._trabajar, args=(ruta, tipo), daemon=True)
+        self._worker.start()
+
+    def cancelar(self):
+        self._cancelar.set()
+        self.btn_cancelar.configure(state="disabled")
+        self.log("⏹ Cancelando (se detiene al terminar el paso en curso)...")
+
+    def _trabajar(self, ruta: str, tipo: str):
+        """Corre en el hilo worker: nunca toca widgets, solo encola mensajes."""
+        import conciliacion
+
+        trabajo = None
         try:
-            if tipo == "Itaú":
-                self.df_excel = lectorItau.procesar_itau(ruta)
+            url_servicio = os.environ.get("CONCILIACION_SERVICIO")
+            if url_servicio:
+                # Cliente liviano: el servicio ya tiene BD, mayor y layouts en memoria
+                import servicio
+                self._cola.put(("progreso", "comparacion", 0))
+                corrida = servicio.ejecutar_remoto(tipo, ruta, url=url_servicio)
+                if self._cancelar.is_set():
+                    raise conciliacion.Cancelado()
+            elif os.environ.get("CONCILIACION_TRABAJOS"):
+                # Con puntos de control: si se corta o se cancela, la próxima corrida retoma
+                import puntos_control
+                corrida, trabajo = puntos_control.ejecutar_reanudable(
+                    tipo,
+                    ruta,
+                    progreso=lambda etapa, filas: self._cola.put(("progreso", etapa, filas)),
+                    cancelado=self._cancelar,
+                )
             else:
-                self.df_excel = lectorBrou.procesar_brou(ruta)
-
-            if self.df_excel is None or self.df_excel.empty:
-                self.log("⚠️ El lector devolvió un DataFrame vacío.")
-                return False
-
-            self.log(f"✅ Archivo {tipo} procesado ({len(self.df_excel)} filas)")
-            return True
-
+                corrida = conciliacion.ejecutar(
+                    tipo,
+                    ruta,
+                    progreso=lambda etapa, filas: self._cola.put(("progreso", etapa, filas)),
+                    cancelado=self._cancelar,
+                    cache=self.cache_comparaciones,
+                )
+        except conciliacion.Cancelado:
+            self._cola.put(("fin", None, None))
         except Exception as e:
-            self.log(f"❌ Error procesando archivo: {e}")
-            messagebox.showerror("Error", str(e))
-            return False
-        
-    # ----------------- LECTURA BD -----------------
-    def consultar_bd(self):
-        self.log("🔌 Conectando a la base de datos...")
-
-        try:
-            if hasattr(db, "probar_conexion") and not db.probar_conexion():
-                self.log("❌ No hay conexión con la base.")
-                return False
-
-            banco = self.combo_tipo.get().strip().lower()
-
-            # Logica banco -> cod_tit
-            if banco == "itaú" or banco == "itau":
-                cod_tit = "113"
-            elif banco == "brou":
-                cod_tit = "001"
-            else:
-                messagebox.showerror("Error", f"Banco desconocido: {banco}")
-                return False
+            self._cola.put(("fin", None, e))
+        else:
+            self._cola.put(("fin", corrida, None, trabajo))
+
+    def _terminar(self, corrida, error, trabajo=None):
+        """Corre en el hilo de la UI cuando el worker termina."""
+        self.btn_procesar.configure(state="normal")
+        self.btn_exportar.configure(state="normal")
+        self.btn_ver.configure(state="normal")
+        self.btn_cancelar.configure(state="disabled")
+
+        if error is not None:
+            self.label_progreso.configure(text="")
+            self.log(f"❌ Error: {error}")
+            messagebox.showerror("Error", str(error))
+            return
+        if corrida is None:
+            self.label_progreso.configure(text="Cancelado")
+            self.log("⏹ Proceso cancelado.")
+            return
 
-            # Llamar ahora sí al método nuevo
-            self.df_bd = db.obtener_df_bd(cod_tit)
+        self.df_excel = corrida.df_excel
+        self.df_bd = corrida.df_bd
+        self.df_comparacion = corrida.df_comparacion
+        self._corrida = corrida
+        # los puntos de control se conservan hasta exportar (si no, se puede retomar)
+        self._trabajo = trabajo
+        self.mostrar_resultados(corrida)
 
-            if self.df_bd is None or self.df_bd.empty:
-                self.log(f"⚠️ La BD no devolvió registros para cod_tit={cod_tit}.")
-                return False
+    # ----------------- RESULTADOS -----------------
+    def mostrar_resultados(self, corrida):
+        for aviso in corrida.avisos:
+            self.log(f"⚠️ {aviso}")
 
-            self.log(f"✅ BD cargada ({len(self.df_bd)} filas) para banco {banco.upper()} con cod_tit={cod_tit}")
-            return True
+        if corrida.omitidos_historial:
+            self.log(f"⏭ {corrida.omitidos_historial} movimientos ya conciliados en corridas anteriores (se omiten)")
 
-        except Exception as e:
-            self.log(f"❌ Error consultando BD: {e}")
-            messagebox.showerror("Error", str(e))
-            return False
+        if self.df_comparacion is None:
+            self.log("✔ No hay movimientos nuevos para comparar.")
+            return
 
-    # ----------------- COMPARACIÓN -----------------
-    def comparar_datos(self):
-        try:
-            self.log("🔄 Comparando datos...")
+        import conciliacion
+        # (en corridas remotas los conteos vienen del servicio)
+        datos = conciliacion.resumen(corrida)
 
-            self.df_comparacion = comparador.comparar(self.df_excel, self.df_bd)
+        self.log(f"✅ Archivo {corrida.banco} procesado ({datos['filas_extracto']} filas nuevas)")
+        if datos["filas_bd"] == 0:
+            self.log("⚠️ La BD no devolvió registros para este banco.")
+        else:
+            self.log(f"✅ BD cargada ({datos['filas_bd']} filas)")
 
-            total = len(self.df_comparacion)
-            encontrados = self.df_comparacion["Encontrado"].sum()
-            no_encontrados = total - encontrados
+        total = datos["total"]
+        encontrados = datos["encontrados"]
+        no_encontrados = datos["no_encontrados"]
 
-            self.log("📊 RESULTADOS")
-            self.log(f"📄 Total movimientos: {total}")
-            self.log(f"✅ Coincidencias encontradas: {encontrados}")
-            self.log(f"❌ No encontrados: {no_encontrados}")
+        self.log("📊 RESULTADOS")
+        self.log(f"📄 Total movimientos: {total}")
+        self.log(f"✅ Coincidencias encontradas: {encontrados}")
+        self.log(f"❌ No encontrados: {no_encontrados}")
 
-            if encontrados > 0:
-                self.log("✔ Comparación completada correctamente.")
-            else:
-                self.log("⚠ No hubo coincidencias.")
+        if encontrados > 0:
+            self.log("✔ Comparación completada correctamente.")
+        else:
+            self.log("⚠ No hubo coincidencias.")
 
-        except Exception as e:
-            self.log(f"❌ Error en comparación: {e}")
-            messagebox.showerror("Error", str(e))
+    def ver_resultados(self):
+        if self.df_comparacion is None:
+            messagebox.showwarning("Advertencia", "No hay resultados para mostrar.")
+            return
 
+        import visor
+        # El visor trabaja sobre el resultado ya calculado (no recompara ni consulta la BD)
+        visor.VisorResultados(self.root, self.df_comparacion, titulo=f"Resultados {self.combo_tipo.get()}")
 
     # ----------------- EXPORTACIÓN -----------------
     def exportar_comparacion(self):
@@ -180,11 +287,7 @@ class ComparadorApp:
             return
 
         try:
-            # Banco para el nombre
-            banco = self.combo_tipo.get().strip() or "Banco"
-            banco_sanitizado = banco.replace(" ", "").upper()  # Itaú -> ITAÚ (queda ITAÚ pero en nombre de archivo se acepta)
-            # Fecha actual
-            fecha_str = datetime.now().strftime("%Y_%m_%d_%H%M%S")
+            import exportador
 
             # Directorio base: mismo que el archivo de entrada (si existe) o cwd
             ruta_entrada = self.entrada_archivo.get().strip()
@@ -193,11 +296,24 @@ class ComparadorApp:
             else:
                 base_dir = os.getcwd()
 
-            nombre_archivo = f"ConciliacionBancaria_{banco_sanitizado}_{fecha_str}.xlsx"
+            # Banco + fecha actual: ConciliacionBancaria_ITAÚ_2025_01_31_120000.xlsx
+            nombre_archivo = exportador.nombre_exportacion(self.combo_tipo.get())
             ruta = os.path.join(base_dir, nombre_archivo)
 
-            # Llamamos al comparador para generar y exportar las coincidencias
-            comparador.comparar_y_exportar(self.df_excel, self.df_bd, ruta)
+            # Se exporta el resultado ya calculado (local, del servicio o de los
+            # puntos de control): no se vuelve a normalizar ni cruzar
+            import comparador
+            comparador.exportar(self.df_comparacion, ruta)
+            if self._corrida is not None:
+                # recién exportado, el resultado pasa al historial de conciliados
+                import conciliacion
+                avisos = len(self._corrida.avisos)
+                conciliacion.confirmar(self._corrida)
+                for aviso in self._corrida.avisos[avisos:]:
+                    self.log(f"⚠️ {aviso}")
+            if self._trabajo is not None:
+                self._trabajo.limpiar()
+                self._trabajo = None
 
             self.log(f"💾 Archivo exportado: {ruta}")
             messagebox.showinfo("Éxito", f"Archivo exportado:\n{ruta}")
@@ -0,0 +1,95 @@
+# medir_arranque.py
+"""
+Chequeo de presupuesto de tiempo de importación (arranque en frío).
+
+Importa cada módulo en un intérprete nuevo con `python -X importtime`,
+toma la mediana de varias corridas y verifica:
+  - que no supere el presupuesto en milisegundos;
+  - que no cargue dependencias pesadas que debería diferir.
+
+Uso:
+    python medir_arranque.py            # sale con código 1 si algo se pasa
+    python medir_arranque.py --corridas 7
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+DIR_SRC = os.path.dirname(os.path.abspath(__file__))
+
+# módulo -> (presupuesto en ms, módulos que NO debe cargar al importarse)
+PRESUPUESTOS = {
+    "main": (150, ("pandas", "openpyxl", "sqlalchemy", "psycopg2")),
+    "db": (50, ("pandas", "sqlalchemy", "psycopg2")),
+    "lectorItau": (900, ("openpyxl", "sqlalchemy", "psycopg2")),
+    "lectorBrou": (900, ("openpyxl", "sqlalchemy", "psycopg2")),
+}
+
+
+def _medir_una_vez(modulo: str) -> tuple[float, set[str]]:
+    """Devuelve (ms acumulados del import, módulos de primer nivel cargados)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=DIR_SRC,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{proc.stderr}")
+
+    total_us = None
+    cargados = set()
+    for linea in proc.stderr.splitlines():
+        # formato: "import time:   self [us] | cumulative | imported package"
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        partes = linea[len("import time:"):].split("|")
+        nombre = partes[2].strip()
+        cargados.add(nombre.split(".")[0])
+        if nombre == modulo:
+            total_us = int(partes[1])
+
+    if total_us is None:
+        raise RuntimeError(f"No se encontró el tiempo de import de {modulo}.")
+    return total_us / 1000, cargados
+
+
+def medir(corridas: int = 5) -> list[dict]:
+    resultados = []
+    for modulo, (presupuesto_ms, prohibidos) in PRESUPUESTOS.items():
+        tiempos = []
+        cargados = set()
+        for _ in range(corridas):
+            ms, cargados = _medir_una_vez(modulo)
+            tiempos.append(ms)
+        mediana = statistics.median(tiempos)
+        indebidos = sorted(m for m in prohibidos if m in cargados)
+        resultados.append({
+            "modulo": modulo,
+            "mediana_ms": round(mediana, 1),
+            "presupuesto_ms": presupuesto_ms,
+            "indebidos": indebidos,
+            "ok": mediana <= presupuesto_ms and not indebidos,
+        })
+    return resultados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Chequeo de tiempo de importación en frío.")
+    parser.add_argument("--corridas", type=int, default=5, help="Corridas por módulo (se toma la mediana).")
+    args = parser.parse_args(argv)
+
+    ok = True
+    for r in medir(args.corridas):
+        estado = "✅" if r["ok"] else "❌"
+        extra = f"  carga: {', '.join(r['indebidos'])}" if r["indebidos"] else ""
+        print(f"{estado} {r['modulo']:<12} {r['mediana_ms']:>8.1f} ms (presupuesto {r['presupuesto_ms']} ms){extra}")
+        ok = ok and r["ok"]
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+# puntos_control.py
+"""
+Corridas reanudables: cada etapa guarda su resultado en un directorio de
+trabajo y, si la corrida se corta (timeout de la BD, se cerró la app), la
+siguiente con las mismas entradas retoma desde el último paso completo.
+
+Etapas con punto de control:
+    extracto          -> extracto leído (antes del historial)
+    mayor_<cod>_<AAAA_MM> -> un archivo por mes de conciliacion.ventana_mayor
+    comparacion       -> resultado del cruce (validado además por la huella
+                         del extracto filtrado, del mayor y de los ajustes)
+
+Estructura:
+    <raíz>/<huella del trabajo>/manifiesto.json
+    <raíz>/<huella del trabajo>/<etapa>.parquet   (con pyarrow)
+    <raíz>/<huella del trabajo>/<etapa>.csv       (sin pyarrow)
+    (los tipos de cada columna van en el manifiesto en ambos formatos)
+
+La huella del trabajo sale del sha256 del archivo del extracto y de los
+parámetros (banco, historial, sugerencias). Cada archivo se valida con su
+sha256 al cargarlo; si no coincide, la etapa se vuelve a calcular. Todas las
+escrituras son atómicas (archivo temporal + os.replace).
+
+Los puntos de control son solo datos (nunca pickle): aunque alguien más pueda
+escribir en el directorio, cargarlos no ejecuta código. Igual conviene que el
+directorio sea privado (se crea con permisos 0700): quien lo escriba puede
+alterar los resultados de una corrida reanudada.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from conciliacion import Corrida
+
+RUTA_TRABAJOS = os.environ.get(
+    "CONCILIACION_TRABAJOS",
+    str(Path.home() / ".conciliacion_bancaria" / "trabajos"),
+)
+# pasado este tiempo, un trabajo a medias se descarta (el mayor pudo cambiar)
+MAX_EDAD_H = 24
+
+MANIFIESTO = "manifiesto.json"
+
+# marca de nulo en los CSV (distinta de la cadena vacía)
+_NULO_CSV = "\\N"
+
+
+def sha256_archivo(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+# ---------- formato de los puntos de control ----------
+def _hay_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _serializar(df: pd.DataFrame) -> tuple[bytes, str, dict]:
+    """
+    DataFrame -> (bytes, formato, tipos). Parquet si hay pyarrow; si no, CSV.
+    Los tipos de cada columna van siempre al manifiesto: Parquet tampoco
+    conserva todos (object de texto vuelve como str).
+    """
+    import pandas as pd
+
+    tipos = {
+        "columnas": {str(c): str(t) for c, t in df.dtypes.items()},
+        "indice": None if isinstance(df.index, pd.RangeIndex) else str(df.index.dtype),
+        "inicio_indice": df.index.start if isinstance(df.index, pd.RangeIndex) else None,
+    }
+    buffer = io.BytesIO()
+    if _hay_pyarrow():
+        df.to_parquet(buffer)
+        return buffer.getvalue(), "parquet", tipos
+
+    df.to_csv(buffer, index=tipos["indice"] is not None, na_rep=_NULO_CSV, float_format="%.17g",
+              date_format="%Y-%m-%dT%H:%M:%S.%f")
+    return buffer.getvalue(), "csv", tipos
+
+
+def _convertir(serie: pd.Series, tipo: str) -> pd.Series:
+    """Columna leída como texto -> su tipo original."""
+    import pandas as pd
+
+    if tipo.startswith("datetime64"):
+        return pd.to_datetime(serie, format="ISO8601").astype(tipo)
+    if tipo in ("bool", "boolean"):
+        return serie.map({"True": True, "False": False}).astype(tipo)
+    if tipo == "category":
+        return serie.astype("category")
+    if tipo == "object":
+        return serie.astype(object).where(serie.notna(), None)
+    if tipo.startswith(("str", "float", "Float")):
+        # astype usa float() de Python: redondeo exacto de los 17 dígitos escritos
+        return serie.astype(tipo)
+    return pd.to_numeric(serie).astype(tipo)
+
+
+def _restaurar(serie: pd.Series, tipo: str) -> pd.Series:
+    """Columna leída de Parquet -> su tipo original, si Parquet lo cambió."""
+    if str(serie.dtype) == tipo:
+        return serie
+    return serie.astype(tipo)
+
+
+def _deserializar(datos: bytes, formato: str, tipos: dict) -> pd.DataFrame:
+    import pandas as pd
+
+    if formato == "parquet":
+        df = pd.read_parquet(io.BytesIO(datos))
+        for col, tipo in tipos["columnas"].items():
+            df[col] = _restaurar(df[col], tipo)
+        return df
+    if formato != "csv":
+        raise ValueError(f"Formato de punto de control desconocido: {formato}")
+
+    con_indice = tipos["indice"] is not None
+    df = pd.read_csv(io.BytesIO(datos), dtype=str, keep_default_na=False, na_values=[_NULO_CSV],
+                     index_col=0 if con_indice else None)
+    for col, tipo in tipos["columnas"].items():
+        df[col] = _convertir(df[col], tipo)
+    if con_indice:
+        df.index = pd.Index(_convertir(df.index.to_series(), tipos["indice"]).to_numpy())
+    elif tipos["inicio_indice"]:
+        df.index = pd.RangeIndex(tipos["inicio_indice"], tipos["inicio_indice"] + len(df))
+    return df
+
+
+def _escribir_atomico(ruta: Path, datos: bytes):
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, prefix=f".{ruta.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, ruta)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+class Trabajo:
+    """Directorio de trabajo de una corrida, con su manifiesto de etapas completas."""
+
+    def __init__(self, raiz: str, entradas: dict, max_edad_h: float = MAX_EDAD_H):
+        self.entradas = entradas
+        self.huella = hashlib.sha256(json.dumps(entradas, sort_keys=True).encode("utf-8")).hexdigest()
+        self.directorio = Path(raiz) / self.huella[:16]
+        self.directorio.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.reanudadas = []  # etapas que se cargaron de disco en esta corrida
+
+        self._manifiesto = self._leer_manifiesto()
+        edad_h = (time.time() - self._manifiesto.get("creado", time.time())) / 3600
+        if self._manifiesto.get("huella") != self.huella or edad_h > max_edad_h:
+            self._manifiesto = {"huella": self.huella, "entradas": entradas, "creado": time.time(), "etapas": {}}
+            self._guardar_manifiesto()
+
+    # ---------- manifiesto ----------
+    def _leer_manifiesto(self) -> dict:
+        try:
+            with open(self.directorio / MANIFIESTO, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _guardar_manifiesto(self):
+        datos = json.dumps(self._manifiesto, ensure_ascii=False, indent=2).encode("utf-8")
+        _escribir_atomico(self.directorio / MANIFIESTO, datos)
+
+    @property
+    def etapas(self) -> list[str]:
+        return list(self._manifiesto["etapas"])
+
+    # ---------- etapas ----------
+    def cargar(self, nombre: str, validacion: str | None = None):
+        """Resultado guardado de la etapa, o None si no está, no valida o está corrupto."""
+        info = self._manifiesto["etapas"].get(nombre)
+        if info is None or info.get("validacion") != validacion:
+            return None
+        ruta = self.directorio / info["archivo"]
+        try:
+            datos = ruta.read_bytes()
+        except FileNotFoundError:
+            return None
+        if hashlib.sha256(datos).hexdigest() != info["sha256"]:
+            return None
+        try:
+            return _deserializar(datos, info["formato"], info.get("tipos"))
+        except Exception:
+            return None
+
+    def guardar(self, nombre: str, valor: pd.DataFrame, validacion: str | None = None):
+        datos, formato, tipos = _serializar(valor)
+        archivo = f"{nombre}.{formato}"
+        _escribir_atomico(self.directorio / archivo, datos)
+        self._manifiesto["etapas"][nombre] = {
+            "archivo": archivo,
+            "formato": formato,
+            "tipos": tipos,
+            "sha256": hashlib.sha256(datos).hexdigest(),
+            "validacion": validacion,
+            "filas": len(valor),
+            "guardado": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._guardar_manifiesto()
+
+    def etapa(self, nombre: str, calcular, validacion: str | None = None):
+        """Devuelve la etapa guardada o la calcula con calcular() y la guarda."""
+        valor = self.cargar(nombre, validacion)
+        if valor is not None:
+            self.reanudadas.append(nombre)
+            print(f"♻️ Etapa '{nombre}' recuperada del punto de control")
+            return valor
+        valor = calcular()
+        if valor is not None:
+            self.guardar(nombre, valor, validacion)
+        return valor
+
+    def limpiar(self):
+        """Borra el directorio del trabajo (la corrida terminó bien)."""
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+# ---------- corrida reanudable ----------
+def _meses(desde, hasta) -> list[tuple]:
+    """[(etiqueta AAAA_MM, desde, hasta), ...] cubriendo [desde, hasta] mes a mes."""
+    import pandas as pd
+
+    meses = []
+    for periodo in pd.period_range(desde, hasta, freq="M"):
+        inicio = max(periodo.start_time.date(), desde)
+        fin = min(periodo.end_time.date(), hasta)
+        meses.append((periodo.strftime("%Y_%m"), inicio, fin))
+    return meses
+
+
+class _CacheTrabajo:
+    """Se pasa como `cache` a conciliacion.ejecutar: la comparación también queda guardada."""
+
+    def __init__(self, trabajo: Trabajo):
+        self.trabajo = trabajo
+
+    def comparar(self, df_excel: pd.DataFrame, df_bd: pd.DataFrame, **ajustes) -> pd.DataFrame:
+        import comparador
+
+        ajustes = {"k_sugerencias": comparador.K_SUGERENCIAS, **ajustes}
+        validacion = hashlib.sha256(
+            f"{comparador.huella_df(df_excel)}|{comparador.huella_df(df_bd)}|{sorted(ajustes.items())}".encode()
+        ).hexdigest()
+        return self.trabajo.etapa(
+            "comparacion", lambda: comparador.comparar(df_excel, df_bd, **ajustes), validacion
+        )
+
+
+def ejecutar_reanudable(
+    banco: str,
+    ruta: str,
+    raiz: str | None = None,
+    usar_historial: bool = True,
+    k_sugerencias: int | None = None,
+    progreso=None,
+    cancelado=None,
+) -> tuple[Corrida, Trabajo]:
+    """
+    Igual que conciliacion.ejecutar, pero guardando cada etapa en el
+    directorio de trabajo (por defecto RUTA_TRABAJOS). Devuelve (corrida,
+    trabajo); quien llama hace trabajo.limpiar() cuando ya no necesita
+    reanudar (p. ej. después de exportar).
+    """
+    import pandas as pd
+
+    import conciliacion
+
+    banco = conciliacion.normalizar_banco(banco)
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No existe el archivo: {ruta}")
+
+    trabajo = Trabajo(raiz or RUTA_TRABAJOS, {
+        "archivo": sha256_archivo(ruta),
+        "banco": banco,
+        "historial": usar_historial,
+        "sugerencias": k_sugerencias,
+    })
+    def _leer_extracto(b, r):
+        return trabajo.etapa("extracto", lambda: conciliacion.leer_extracto_banco(b, r))
+
+    def _obtener_mayor(cod_tit, al_leer_lote, desde=None, hasta=None):
+        if desde is None or hasta is None:
+            return conciliacion.leer_mayor(cod_tit, al_leer_lote, desde=desde, hasta=hasta)
+
+        # la misma ventana que una corrida sin puntos de control, partida por mes
+        partes = []
+        filas = 0
+        for etiqueta, inicio, fin in _meses(desde, hasta):
+            def _leer(inicio=inicio, fin=fin):
+                df = conciliacion.leer_mayor(cod_tit, desde=inicio, hasta=fin)
+                if df is None:
+                    raise RuntimeError(f"No se pudo leer la BD ({inicio} a {fin}).")
+                return df
+
+            # un mes de borde guardado con otra ventana no sirve
+            parte = trabajo.etapa(f"mayor_{cod_tit}_{etiqueta}", _leer, validacion=f"{inicio}|{fin}")
+            partes.append(parte)
+            filas += len(parte)
+            if al_leer_lote is not None:
+                al_leer_lote(filas)  # entre meses se informa progreso y se puede cancelar
+        return pd.concat(partes, ignore_index=True)
+
+    corrida = conciliacion.ejecutar(
+        banco,
+        ruta,
+        usar_historial=usar_historial,
+        progreso=progreso,
+        cancelado=cancelado,
+        cache=_CacheTrabajo(trabajo),
+        leer_extracto=_leer_extracto,
+        obtener_mayor=_obtener_mayor,
+        k_sugerencias=k_sugerencias,
+    )
+    if trabajo.reanudadas:
+        corrida.avisos.append(f"Se reanudó desde puntos de control: {', '.join(trabajo.reanudadas)}")
+    return corrida, trabajo
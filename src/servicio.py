@@ -0,0 +1,439 @@
+# servicio.py
+"""
+Servicio local de conciliación con caches calientes.
+
+Un proceso de larga vida que mantiene en memoria:
+    - el engine de SQLAlchemy (db.obtener_engine),
+    - una foto del mayor por cod_tit (se refresca pasados `ttl_mayor` segundos
+      o con POST /invalidar),
+    - los layouts de encabezado que aprendieron los lectores,
+    - los extractos ya parseados (por sha256 del archivo),
+    - las comparaciones ya hechas (comparador.CacheComparaciones).
+
+Así una reconciliación repetida no paga imports, conexión, lectura de BD ni
+detección de encabezados.
+
+Endpoints (solo escucha en 127.0.0.1 por defecto):
+    GET  /salud                                  estado de las caches (JSON)
+    POST /comparar?banco=itau&nombre=x.xlsx      cuerpo = bytes del extracto
+         [&historial=0] [&sugerencias=K] [&formato=json|xlsx|csv|parquet]
+         -> resumen en el encabezado X-Resumen (JSON); cuerpo = resultado
+            (DataFrame como JSON orient="table", o el archivo exportado);
+            si usa historial, el id de la corrida en X-Corrida
+    POST /confirmar?corrida=<id>                 el cliente ya exportó: registra la
+                                                 corrida en el historial
+    POST /invalidar[?cod_tit=113]                descarta fotos del mayor y comparaciones
+
+Uso:
+    python -m conciliacion serve --port 8765
+    python -m conciliacion run --bank itau --file extracto.xlsx --servicio http://127.0.0.1:8765
+
+La GUI usa el servicio si está definida la variable CONCILIACION_SERVICIO.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from conciliacion import Corrida
+
+HOST_POR_DEFECTO = "127.0.0.1"
+PUERTO_POR_DEFECTO = 8765
+URL_POR_DEFECTO = f"http://{HOST_POR_DEFECTO}:{PUERTO_POR_DEFECTO}"
+
+# segundos que se reutiliza la foto del mayor antes de volver a leer la BD
+TTL_MAYOR_S = 300
+# extractos parseados que se guardan (LRU)
+MAX_EXTRACTOS = 8
+# tamaño máximo de un extracto subido
+MAX_SUBIDA = 200 * 2**20
+# corridas esperando que el cliente confirme la exportación (LRU)
+MAX_PENDIENTES = 16
+
+ENCABEZADO_RESUMEN = "X-Resumen"
+ENCABEZADO_CORRIDA = "X-Corrida"
+FORMATOS_ARCHIVO = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet"}
+
+
+def _recortar(df: pd.DataFrame, desde=None, hasta=None) -> pd.DataFrame:
+    """Filas del mayor con fec_doc en [desde, hasta] (lo mismo que filtra la consulta a la BD)."""
+    if desde is None and hasta is None:
+        return df
+    import pandas as pd
+
+    fechas = df["fec_doc"]
+    dentro = fechas.notna()
+    if desde is not None:
+        dentro &= fechas >= pd.Timestamp(desde)
+    if hasta is not None:
+        dentro &= fechas <= pd.Timestamp(hasta)
+    return df[dentro.to_numpy()].reset_index(drop=True)
+
+
+class Servicio:
+    """Estado caliente compartido por todas las peticiones."""
+
+    def __init__(self, ttl_mayor: float = TTL_MAYOR_S, max_extractos: int = MAX_EXTRACTOS):
+        import comparador
+
+        self.ttl_mayor = ttl_mayor
+        self.max_extractos = max_extractos
+        self.cache = comparador.CacheComparaciones()
+        self._mayores = {}  # cod_tit -> (momento de lectura, df)
+        self._extractos = OrderedDict()  # (banco, sha256) -> df
+        self._pendientes = OrderedDict()  # id -> Corrida sin confirmar
+        self._lock = threading.Lock()
+        # las corridas se atienden de a una: la cache de comparaciones y los
+        # layouts de los lectores no son seguros entre hilos
+        self._lock_corrida = threading.Lock()
+        self.inicio = time.time()
+
+    # ---------- caches ----------
+    def mayor(self, cod_tit: str, al_leer_lote=None, desde=None, hasta=None) -> pd.DataFrame | None:
+        """
+        Foto del mayor para cod_tit (completa; se lee de la BD si no hay o
+        venció), recortada a la ventana desde/hasta que pide ejecutar.
+        """
+        foto = self._mayores.get(cod_tit)
+        if foto is not None and time.monotonic() - foto[0] < self.ttl_mayor:
+            df = foto[1]
+        else:
+            import conciliacion
+
+            df = conciliacion.leer_mayor(cod_tit, al_leer_lote)
+            if df is None:
+                return None
+            with self._lock:
+                self._mayores[cod_tit] = (time.monotonic(), df)
+        return _recortar(df, desde, hasta)
+
+    def extracto(self, banco: str, ruta: str, huella: str) -> pd.DataFrame:
+        """Extracto parseado; si ya se subió el mismo archivo, no se vuelve a leer."""
+        clave = (banco, huella)
+        with self._lock:
+            if clave in self._extractos:
+                self._extractos.move_to_end(clave)
+                return self._extractos[clave]
+        import conciliacion
+
+        df = conciliacion.leer_extracto_banco(banco, ruta)
+        with self._lock:
+            self._extractos[clave] = df
+            while len(self._extractos) > self.max_extractos:
+                self._extractos.popitem(last=False)
+        return df
+
+    def invalidar(self, cod_tit: str | None = None):
+        with self._lock_corrida, self._lock:
+            if cod_tit is None:
+                self._mayores.clear()
+            else:
+                self._mayores.pop(cod_tit, None)
+            self.cache.invalidar()
+
+    def precargar(self, bancos):
+        """Conecta a la BD y lee el mayor de cada banco antes de la primera petición."""
+        import db
+
+        with self._lock_corrida:
+            for banco in bancos:
+                self.mayor(db.cod_tit_para_banco(banco))
+
+    def estado(self) -> dict:
+        ahora = time.monotonic()
+        return {
+            "ok": True,
+            "activo_segundos": round(time.time() - self.inicio, 1),
+            "mayores": {
+                cod_tit: {"filas": len(df), "edad_segundos": round(ahora - momento, 1)}
+                for cod_tit, (momento, df) in list(self._mayores.items())
+            },
+            "extractos": len(self._extractos),
+            "pendientes_confirmar": len(self._pendientes),
+            "comparaciones": {"aciertos": self.cache.aciertos, "fallos": self.cache.fallos},
+        }
+
+    # ---------- conciliación ----------
+    def comparar(
+        self,
+        banco: str,
+        datos: bytes,
+        nombre: str,
+        usar_historial: bool = True,
+        k_sugerencias: int | None = None,
+    ) -> Corrida:
+        import conciliacion
+
+        banco = conciliacion.normalizar_banco(banco)
+        huella = hashlib.sha256(datos).hexdigest()
+        sufijo = os.path.splitext(nombre)[1].lower() or ".xlsx"
+
+        # los lectores trabajan con rutas: el archivo subido va a un temporal
+        fd, ruta = tempfile.mkstemp(prefix="conciliacion_", suffix=sufijo)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(datos)
+            with self._lock_corrida:
+                corrida = conciliacion.ejecutar(
+                    banco,
+                    ruta,
+                    usar_historial=usar_historial,
+                    cache=self.cache,
+                    leer_extracto=lambda b, r: self.extracto(b, r, huella),
+                    obtener_mayor=self.mayor,
+                    k_sugerencias=k_sugerencias,
+                )
+        finally:
+            os.remove(ruta)
+        corrida.archivo = nombre
+        return corrida
+
+    def pendiente(self, corrida: Corrida) -> str:
+        """Guarda la corrida hasta que el cliente confirme que la exportó; devuelve su id."""
+        id_corrida = uuid.uuid4().hex
+        with self._lock:
+            self._pendientes[id_corrida] = corrida
+            while len(self._pendientes) > MAX_PENDIENTES:
+                self._pendientes.popitem(last=False)
+        return id_corrida
+
+    def confirmar(self, id_corrida: str) -> int:
+        import conciliacion
+
+        with self._lock:
+            corrida = self._pendientes.pop(id_corrida, None)
+        if corrida is None:
+            raise ValueError(f"Corrida desconocida o vencida: {id_corrida}")
+        with self._lock_corrida:
+            registradas = conciliacion.confirmar(corrida)
+        if corrida.historial_pendiente:
+            raise RuntimeError("; ".join(corrida.avisos[-1:]) or "No se pudo actualizar el historial.")
+        return registradas
+
+
+# ---------- HTTP ----------
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "ConciliacionServicio/1.0"
+
+    @property
+    def servicio(self) -> Servicio:
+        return self.server.servicio
+
+    def log_message(self, formato, *args):
+        print(f"🌐 {self.address_string()} {formato % args}", file=sys.stderr)
+
+    def _responder(self, estado: int, cuerpo: bytes, tipo: str = "application/json", encabezados=None):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in (encabezados or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _json(self, estado: int, datos: dict):
+        self._responder(estado, json.dumps(datos, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/salud":
+            self._json(200, self.servicio.estado())
+        else:
+            self._json(404, {"error": f"Ruta desconocida: {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/comparar":
+                self._comparar(params)
+            elif url.path == "/confirmar":
+                registradas = self.servicio.confirmar(params.get("corrida", ""))
+                self._json(200, {"registradas": registradas})
+            elif url.path == "/invalidar":
+                self.servicio.invalidar(params.get("cod_tit"))
+                self._json(200, self.servicio.estado())
+            else:
+                self._json(404, {"error": f"Ruta desconocida: {url.path}"})
+        except (ValueError, FileNotFoundError) as e:
+            self._json(400, {"error": str(e)})
+        except Exception as e:
+            print(f"❌ {e}", file=sys.stderr)
+            self._json(500, {"error": str(e)})
+
+    def _comparar(self, params: dict):
+        import conciliacion
+
+        banco = params.get("banco")
+        if not banco:
+            raise ValueError("Falta el parámetro 'banco'.")
+        formato = params.get("formato", "json")
+        if formato != "json" and formato not in FORMATOS_ARCHIVO:
+            raise ValueError(f"Formato no soportado: {formato}")
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo <= 0:
+            raise ValueError("El cuerpo debe traer el archivo del extracto.")
+        if largo > MAX_SUBIDA:
+            raise ValueError(f"El archivo supera el máximo de {MAX_SUBIDA // 2**20} MB.")
+        datos = self.rfile.read(largo)
+
+        corrida = self.servicio.comparar(
+            banco,
+            datos,
+            params.get("nombre") or "extracto.xlsx",
+            usar_historial=params.get("historial", "1") not in ("0", "false", "no"),
+            k_sugerencias=int(params["sugerencias"]) if "sugerencias" in params else None,
+        )
+        resumen = conciliacion.resumen(corrida)
+        encabezados = {ENCABEZADO_RESUMEN: json.dumps(resumen)}  # ASCII: va en un encabezado HTTP
+        if corrida.historial_pendiente:
+            encabezados[ENCABEZADO_CORRIDA] = self.servicio.pendiente(corrida)
+
+        import exportador
+
+        if formato == "json":
+            cuerpo = b"null"
+            if corrida.df_comparacion is not None:
+                cuerpo = exportador.sin_columnas_internas(corrida.df_comparacion).to_json(
+                    orient="table", date_format="iso"
+                ).encode("utf-8")
+            self._responder(200, cuerpo, encabezados=encabezados)
+            return
+
+        if corrida.df_comparacion is None:
+            self._responder(204, b"", encabezados=encabezados)
+            return
+
+        fd, ruta = tempfile.mkstemp(prefix="conciliacion_", suffix=FORMATOS_ARCHIVO[formato])
+        os.close(fd)
+        try:
+            exportador.exportar(corrida.df_comparacion, ruta)
+            with open(ruta, "rb") as f:
+                cuerpo = f.read()
+        finally:
+            os.remove(ruta)
+        self._responder(200, cuerpo, "application/octet-stream", encabezados)
+
+
+def servir(
+    host: str = HOST_POR_DEFECTO,
+    puerto: int = PUERTO_POR_DEFECTO,
+    ttl_mayor: float = TTL_MAYOR_S,
+    precargar=(),
+):
+    """Levanta el servicio y atiende hasta Ctrl+C."""
+    servicio = Servicio(ttl_mayor=ttl_mayor)
+    if precargar:
+        print(f"🔥 Precargando mayor de: {', '.join(precargar)}", file=sys.stderr)
+        servicio.precargar(precargar)
+
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    servidor.servicio = servicio
+    servidor.daemon_threads = True
+    print(f"🚀 Servicio de conciliación en http://{host}:{servidor.server_address[1]}", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# ---------- cliente ----------
+def confirmar_remoto(corrida: Corrida, timeout: float = 60) -> int:
+    """Avisa al servicio que la corrida remota ya se exportó (ver conciliacion.confirmar)."""
+    import urllib.error
+    import urllib.request
+
+    consulta = urlencode({"corrida": corrida.remoto["corrida"]})
+    pedido = urllib.request.Request(f"{corrida.remoto['servicio']}/confirmar?{consulta}", data=b"", method="POST")
+    try:
+        with urllib.request.urlopen(pedido, timeout=timeout) as respuesta:
+            return json.loads(respuesta.read())["registradas"]
+    except urllib.error.HTTPError as e:
+        try:
+            mensaje = json.loads(e.read())["error"]
+        except Exception:
+            mensaje = str(e)
+        raise RuntimeError(f"El servicio respondió {e.code}: {mensaje}") from None
+
+
+
+def ejecutar_remoto(
+    banco: str,
+    ruta: str,
+    url: str | None = None,
+    usar_historial: bool = True,
+    timeout: float = 600,
+    k_sugerencias: int | None = None,
+) -> Corrida:
+    """
+    Equivalente a conciliacion.ejecutar() pero delegando en el servicio.
+    Devuelve una Corrida con df_comparacion; df_excel y df_bd quedan en el
+    servicio (los conteos vienen en corrida.remoto).
+    """
+    import io
+    import urllib.error
+    import urllib.request
+
+    import pandas as pd
+
+    import conciliacion
+
+    banco = conciliacion.normalizar_banco(banco)
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No existe el archivo: {ruta}")
+    with open(ruta, "rb") as f:
+        datos = f.read()
+
+    url = (url or os.environ.get("CONCILIACION_SERVICIO") or URL_POR_DEFECTO).rstrip("/")
+    parametros = {
+        "banco": banco,
+        "nombre": os.path.basename(ruta),
+        "historial": "1" if usar_historial else "0",
+    }
+    if k_sugerencias is not None:
+        parametros["sugerencias"] = k_sugerencias
+    consulta = urlencode(parametros)
+    pedido = urllib.request.Request(
+        f"{url}/comparar?{consulta}",
+        data=datos,
+        method="POST",
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    try:
+        with urllib.request.urlopen(pedido, timeout=timeout) as respuesta:
+            resumen = json.loads(respuesta.headers[ENCABEZADO_RESUMEN])
+            id_corrida = respuesta.headers.get(ENCABEZADO_CORRIDA)
+            cuerpo = respuesta.read()
+    except urllib.error.HTTPError as e:
+        try:
+            mensaje = json.loads(e.read())["error"]
+        except Exception:
+            mensaje = str(e)
+        raise RuntimeError(f"El servicio respondió {e.code}: {mensaje}") from None
+
+    corrida = conciliacion.Corrida(banco=banco, archivo=ruta, remoto=resumen)
+    if id_corrida:
+        # se registra en el historial del servicio con conciliacion.confirmar()
+        corrida.remoto = {**resumen, "servicio": url, "corrida": id_corrida}
+        corrida.historial_pendiente = True
+    corrida.omitidos_historial = resumen["omitidos_historial"]
+    corrida.avisos = list(resumen["avisos"])
+    corrida.segundos = dict(resumen["segundos"])
+    if cuerpo.strip() != b"null":
+        corrida.df_comparacion = pd.read_json(io.StringIO(cuerpo.decode("utf-8")), orient="table")
+    return corrida
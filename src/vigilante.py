@@ -0,0 +1,274 @@
+# vigilante.py
+"""
+Carpeta vigilada: concilia los extractos a medida que llegan.
+
+Escucha eventos de inotify (sin sondear) sobre una carpeta. Cuando aparece
+un .xls/.xlsx nuevo y estable (IN_CLOSE_WRITE o IN_MOVED_TO, sin más eventos
+durante `debounce` segundos), lo manda a un pool chico de procesos que:
+    detecta el banco -> lee el extracto -> trae de la BD la ventana de fechas
+    del extracto (conciliacion.ventana_mayor) -> compara -> exporta el resultado junto al archivo
+    (ConciliacionBancaria_<BANCO>_<fecha>_<extracto>.xlsx, igual que la GUI).
+
+Una ráfaga de archivos se procesa en paralelo (un proceso por archivo, hasta
+`trabajadores`). Por cada archivo terminado se imprime una línea JSON con el
+resumen en stdout; los mensajes de avance van a stderr.
+
+Solo Linux (inotify). Uso:
+    python -m conciliacion watch --dir /srv/tesoreria/extractos --workers 3
+"""
+from __future__ import annotations
+
+import contextlib
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+EXTENSIONES = (".xls", ".xlsx")
+# temporales de Excel, ocultos y nuestros propios resultados
+PREFIJOS_IGNORADOS = ("~$", ".", "ConciliacionBancaria_")
+DEBOUNCE_S = 2.0
+TRABAJADORES = 2
+
+# nombre de archivo (sin acentos, en minúsculas) -> banco
+PATRONES_BANCO = [
+    ("estado_de_cuenta", "itau"),
+    ("detalle_movimiento", "brou"),
+]
+
+# ---------- inotify (linux/inotify.h) ----------
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENTO = struct.Struct("iIII")  # wd, mask, cookie, len (+ name[len])
+
+
+class Inotify:
+    """Envoltorio mínimo de inotify con ctypes (sin dependencias externas)."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise RuntimeError("La carpeta vigilada usa inotify: solo está disponible en Linux.")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+
+    def vigilar(self, carpeta: str, mascara: int = IN_CLOSE_WRITE | IN_MOVED_TO) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(carpeta), ctypes.c_uint32(mascara))
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch({carpeta}): {os.strerror(errno)}")
+        return wd
+
+    def eventos(self, timeout: float) -> list[tuple[int, str]]:
+        """Espera hasta `timeout` segundos y devuelve [(mascara, nombre), ...]."""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        eventos = []
+        i = 0
+        while i < len(datos):
+            _wd, mascara, _cookie, largo = _EVENTO.unpack_from(datos, i)
+            i += _EVENTO.size
+            nombre = datos[i:i + largo].rstrip(b"\0")
+            i += largo
+            eventos.append((mascara, os.fsdecode(nombre)))
+        return eventos
+
+    def cerrar(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+# ---------- qué archivos y de qué banco ----------
+def es_candidato(nombre: str) -> bool:
+    return nombre.lower().endswith(EXTENSIONES) and not nombre.startswith(PREFIJOS_IGNORADOS)
+
+
+def detectar_banco(ruta: str) -> str | None:
+    """Banco según el nombre con que cada home banking exporta el archivo (o None)."""
+    nombre = os.path.basename(ruta).lower().replace("-", "_").replace(" ", "_")
+    for patron, banco in PATRONES_BANCO:
+        if patron in nombre:
+            return banco
+    return None
+
+
+# Sin pista en el nombre, cada lector acepta encabezados del otro banco
+# (los dos reconocen "Descripción", "Débito" y "Crédito"). Lo que distingue a
+# cada layout son sus columnas propias: el saldo corrido de Itaú y las
+# columnas de documento de BROU. Itaú va primero: BROU no trae saldo.
+_COLUMNAS_PROPIAS = {
+    "Itaú": ("Saldo",),
+    "BROU": ("Número de documento", "Asunto", "Dependencia"),
+}
+
+
+def _layout_de(banco: str, df: pd.DataFrame) -> bool:
+    """True si el extracto leído trae datos en alguna columna propia del banco."""
+    return any(c in df.columns and df[c].notna().any() for c in _COLUMNAS_PROPIAS[banco])
+
+
+def _leer_detectando(ruta: str) -> tuple[str, pd.DataFrame]:
+    """
+    Lee el extracto con el lector del banco detectado por nombre. Si el nombre
+    no lo dice, prueba Itaú y después BROU, y solo acepta la lectura si
+    trae las columnas propias de ese layout (ver _COLUMNAS_PROPIAS).
+    """
+    import conciliacion
+
+    banco = detectar_banco(ruta)
+    candidatos = [banco] if banco else ["itau", "brou"]
+    errores = []
+    for banco in candidatos:
+        banco = conciliacion.normalizar_banco(banco)
+        try:
+            df = conciliacion.leer_extracto_banco(banco, ruta)
+        except Exception as e:
+            errores.append(f"{banco}: {e}")
+            continue
+        if df is None or df.empty:
+            errores.append(f"{banco}: sin movimientos")
+        elif len(candidatos) > 1 and not _layout_de(banco, df):
+            errores.append(f"{banco}: sin columnas {', '.join(_COLUMNAS_PROPIAS[banco])}")
+        else:
+            return banco, df
+    raise ValueError(f"No se reconoció el extracto {os.path.basename(ruta)} ({'; '.join(errores)})")
+
+
+# ---------- trabajo por archivo (corre en un proceso del pool) ----------
+def procesar_archivo(ruta: str, usar_historial: bool = True) -> dict:
+    """Concilia un extracto y exporta el resultado en su misma carpeta. Devuelve el resumen."""
+    import comparador
+    import conciliacion
+    import exportador
+
+    # stdout queda para las líneas JSON del proceso principal
+    with contextlib.redirect_stdout(sys.stderr):
+        banco, df_excel = _leer_detectando(ruta)
+
+        # el mayor se lee en conciliacion.ventana_mayor, igual que en `run` y la GUI
+        corrida = conciliacion.ejecutar(
+            banco,
+            ruta,
+            usar_historial=usar_historial,
+            leer_extracto=lambda b, r: df_excel,
+        )
+
+        salida = None
+        if corrida.df_comparacion is not None:
+            salida = os.path.join(
+                os.path.dirname(os.path.abspath(ruta)),
+                exportador.nombre_exportacion(banco, origen=ruta),
+            )
+            t0 = time.perf_counter()
+            comparador.exportar(corrida.df_comparacion, salida)
+            corrida.segundos["exportacion"] = time.perf_counter() - t0
+            conciliacion.confirmar(corrida)
+
+    return conciliacion.resumen(corrida, salida)
+
+
+# ---------- bucle principal ----------
+def vigilar(
+    carpeta: str,
+    trabajadores: int = TRABAJADORES,
+    debounce: float = DEBOUNCE_S,
+    usar_historial: bool = True,
+    procesar_existentes: bool = False,
+    al_terminar=None,
+    detener=None,
+):
+    """
+    Vigila `carpeta` hasta Ctrl+C (o hasta que se active el Event `detener`).
+
+    al_terminar: callable(ruta, resumen, error) por cada archivo procesado;
+    por defecto imprime el resumen (o el error) como una línea JSON.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    carpeta = os.path.abspath(carpeta)
+    if not os.path.isdir(carpeta):
+        raise FileNotFoundError(f"No existe la carpeta: {carpeta}")
+    al_terminar = al_terminar or _imprimir_resultado
+
+    pendientes = {}  # nombre -> momento del último evento (debounce)
+    enviados = {}  # ruta -> (mtime_ns, tamaño) ya procesado: no repetir el mismo archivo
+    en_curso = {}  # future -> ruta
+
+    def _encolar_existentes():
+        for nombre in sorted(os.listdir(carpeta)):
+            if es_candidato(nombre):
+                pendientes.setdefault(nombre, 0.0)
+
+    with Inotify() as inotify, ProcessPoolExecutor(max_workers=trabajadores) as pool:
+        inotify.vigilar(carpeta)
+        print(f"👀 Vigilando {carpeta} ({trabajadores} trabajadores, debounce {debounce:g} s)", file=sys.stderr)
+        if procesar_existentes:
+            _encolar_existentes()
+
+        while detener is None or not detener.is_set():
+            espera = 0.5 if (pendientes or en_curso) else 1.0
+            for mascara, nombre in inotify.eventos(espera):
+                if mascara & IN_Q_OVERFLOW:
+                    # se perdieron eventos: revisamos la carpeta entera
+                    _encolar_existentes()
+                elif nombre and es_candidato(nombre):
+                    pendientes[nombre] = time.monotonic()
+
+            ahora = time.monotonic()
+            for nombre, momento in list(pendientes.items()):
+                if ahora - momento < debounce:
+                    continue
+                del pendientes[nombre]
+                ruta = os.path.join(carpeta, nombre)
+                try:
+                    st = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                firma = (st.st_mtime_ns, st.st_size)
+                if enviados.get(ruta) == firma:
+                    continue
+                enviados[ruta] = firma
+                print(f"📁 Nuevo extracto: {nombre}", file=sys.stderr)
+                en_curso[pool.submit(procesar_archivo, ruta, usar_historial)] = ruta
+
+            for futuro in [f for f in en_curso if f.done()]:
+                ruta = en_curso.pop(futuro)
+                error = futuro.exception()
+                al_terminar(ruta, None if error else futuro.result(), error)
+
+
+def _imprimir_resultado(ruta: str, resumen: dict | None, error: BaseException | None):
+    if error is not None:
+        print(f"❌ {os.path.basename(ruta)}: {error}", file=sys.stderr)
+        print(json.dumps({"archivo": ruta, "error": str(error)}, ensure_ascii=False), flush=True)
+        return
+    print(f"✅ {os.path.basename(ruta)}: {resumen['encontrados']}/{resumen['total']} encontrados"
+          + (f" -> {resumen['salida']}" if resumen["salida"] else ""), file=sys.stderr)
+    print(json.dumps(resumen, ensure_ascii=False), flush=True)
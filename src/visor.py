@@ -0,0 +1,282 @@
+# visor.py
+"""
+Visor de resultados dentro de la app, pensado para comparaciones grandes
+(cientos de miles de filas).
+
+- Scroll virtual: el Treeview solo contiene las filas visibles; al desplazarse
+  se reemplazan esas pocas filas, nunca se cargan las 500k.
+- Filtros (solo no encontrados, rango de fechas, búsqueda por monto/texto)
+  con máscaras vectorizadas sobre arrays precalculados del DataFrame.
+- Orden por columna sobre el mismo DataFrame: el orden completo de cada columna
+  se calcula una vez y luego solo se filtra con la máscara activa.
+Nada de esto vuelve a consultar la BD ni a comparar.
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import numpy as np
+import pandas as pd
+
+ALTO_FILA = 20          # px por fila del Treeview (aprox., para calcular filas visibles)
+FILAS_INICIALES = 25
+
+
+def _parsear_fecha(texto: str):
+    texto = texto.strip()
+    if not texto:
+        return None
+    fecha = pd.to_datetime(texto, errors="coerce", dayfirst=True)
+    if pd.isna(fecha):
+        raise ValueError(f"Fecha inválida: {texto}")
+    return fecha.normalize()
+
+
+def _parsear_monto(texto: str) -> float | None:
+    """Acepta '1.234,56', '1234,56' o '1234.56'. Devuelve None si no es un número."""
+    x = texto.strip().replace(" ", "")
+    if "," in x:
+        x = x.replace(".", "").replace(",", ".")
+    try:
+        return float(x)
+    except ValueError:
+        return None
+
+
+def _formatear(valor) -> str:
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    if isinstance(valor, (pd.Timestamp,)):
+        return valor.strftime("%d/%m/%Y")
+    if hasattr(valor, "strftime"):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, (bool, np.bool_)):
+        return "Sí" if valor else "No"
+    if isinstance(valor, (float, np.floating)):
+        return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return str(valor)
+
+
+class VisorResultados(tk.Toplevel):
+    def __init__(self, master, df: pd.DataFrame, titulo: str = "Resultados de la comparación"):
+        super().__init__(master)
+        self.title(titulo)
+        self.geometry("1100x650")
+
+        import exportador
+        self.df = exportador.sin_columnas_internas(df).reset_index(drop=True)
+        self.columnas = [str(c) for c in self.df.columns]
+        self.n = len(self.df)
+
+        self._preparar_arrays()
+
+        self.indices = np.arange(self.n)     # filas filtradas y ordenadas (posiciones en self.df)
+        self.offset = 0
+        self.filas_visibles = FILAS_INICIALES
+        self._ordenes = {}                   # columna -> orden completo (argsort) precalculado
+        self.orden_col = None
+        self.orden_desc = False
+
+        self._build_ui()
+        self._refrescar()
+
+    # ---------- datos ----------
+    def _preparar_arrays(self):
+        """Arrays numpy que usan los filtros (se calculan una sola vez)."""
+        df = self.df
+
+        if "Encontrado" in df.columns:
+            self._encontrado = df["Encontrado"].fillna(False).astype(bool).to_numpy()
+        else:
+            self._encontrado = np.zeros(self.n, dtype=bool)
+
+        col_fecha = next((c for c in ("Fecha_Excel", "Fecha_norm", "Fecha") if c in df.columns), None)
+        if col_fecha:
+            self._fecha = pd.to_datetime(df[col_fecha], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        else:
+            self._fecha = np.full(self.n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+        col_monto = next((c for c in ("Monto_Excel", "Monto_norm") if c in df.columns), None)
+        if col_monto:
+            monto = pd.to_numeric(df[col_monto], errors="coerce").abs()
+            self._monto_cent = (monto * 100).round().fillna(-1).astype("int64").to_numpy()
+        else:
+            self._monto_cent = np.full(self.n, -1, dtype="int64")
+
+        self._col_texto = "Descripcion" if "Descripcion" in df.columns else None
+
+    def _mascara_texto(self, texto: str) -> np.ndarray:
+        if not self._col_texto:
+            return np.zeros(self.n, dtype=bool)
+        serie = self.df[self._col_texto]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # se busca sobre las categorías (pocas) y se expande por código
+            coincide = serie.cat.categories.astype(str).str.contains(texto, case=False, regex=False)
+            codigos = serie.cat.codes.to_numpy()
+            return (codigos >= 0) & np.asarray(coincide)[codigos]
+        return serie.astype(str).str.contains(texto, case=False, regex=False).fillna(False).to_numpy()
+
+    def _mascara(self) -> np.ndarray:
+        mascara = np.ones(self.n, dtype=bool)
+
+        if self.var_solo_no_encontrados.get():
+            mascara &= ~self._encontrado
+
+        desde = _parsear_fecha(self.entrada_desde.get())
+        hasta = _parsear_fecha(self.entrada_hasta.get())
+        if desde is not None:
+            mascara &= self._fecha >= desde.to_datetime64()
+        if hasta is not None:
+            mascara &= self._fecha < (hasta + pd.Timedelta(days=1)).to_datetime64()
+
+        busqueda = self.entrada_buscar.get().strip()
+        if busqueda:
+            monto = _parsear_monto(busqueda)
+            if monto is not None:
+                mascara &= self._monto_cent == int(round(abs(monto) * 100))
+            else:
+                mascara &= self._mascara_texto(busqueda)
+
+        return mascara
+
+    def _orden_completo(self, col: str) -> np.ndarray:
+        if col not in self._ordenes:
+            serie = self.df[col]
+            try:
+                orden = serie.sort_values(kind="mergesort", na_position="last").index.to_numpy()
+            except TypeError:
+                # columnas con tipos mezclados: se ordenan como texto
+                orden = serie.astype(str).sort_values(kind="mergesort").index.to_numpy()
+            self._ordenes[col] = orden
+        return self._ordenes[col]
+
+    def aplicar_filtros(self, *_):
+        try:
+            mascara = self._mascara()
+        except ValueError as e:
+            messagebox.showerror("Filtro inválido", str(e), parent=self)
+            return
+
+        if self.orden_col is None:
+            self.indices = np.flatnonzero(mascara)
+        else:
+            orden = self._orden_completo(self.orden_col)
+            self.indices = orden[mascara[orden]]
+            if self.orden_desc:
+                self.indices = self.indices[::-1]
+
+        self.offset = 0
+        self._refrescar()
+
+    def ordenar_por(self, col: str):
+        if self.orden_col == col:
+            self.orden_desc = not self.orden_desc
+        else:
+            self.orden_col, self.orden_desc = col, False
+        for c in self.columnas:
+            flecha = (" ▼" if self.orden_desc else " ▲") if c == col else ""
+            self.tree.heading(c, text=c + flecha)
+        self.aplicar_filtros()
+
+    # ---------- UI ----------
+    def _build_ui(self):
+        filtros = ttk.Frame(self, padding=(10, 8))
+        filtros.pack(fill="x")
+
+        self.var_solo_no_encontrados = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filtros, text="Solo no encontrados", variable=self.var_solo_no_encontrados,
+                        command=self.aplicar_filtros).pack(side="left", padx=(0, 12))
+
+        ttk.Label(filtros, text="Desde:").pack(side="left")
+        self.entrada_desde = ttk.Entry(filtros, width=12)
+        self.entrada_desde.pack(side="left", padx=(2, 8))
+        ttk.Label(filtros, text="Hasta:").pack(side="left")
+        self.entrada_hasta = ttk.Entry(filtros, width=12)
+        self.entrada_hasta.pack(side="left", padx=(2, 12))
+
+        ttk.Label(filtros, text="Monto / texto:").pack(side="left")
+        self.entrada_buscar = ttk.Entry(filtros, width=18)
+        self.entrada_buscar.pack(side="left", padx=(2, 8))
+
+        ttk.Button(filtros, text="Filtrar", command=self.aplicar_filtros).pack(side="left")
+        for entrada in (self.entrada_desde, self.entrada_hasta, self.entrada_buscar):
+            entrada.bind("<Return>", self.aplicar_filtros)
+
+        tabla = ttk.Frame(self, padding=(10, 0))
+        tabla.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(tabla, columns=self.columnas, show="headings", height=FILAS_INICIALES)
+        for c in self.columnas:
+            self.tree.heading(c, text=c, command=lambda col=c: self.ordenar_por(col))
+            self.tree.column(c, width=120, stretch=True)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        # el scrollbar no controla al Treeview sino nuestro offset virtual
+        self.scroll = ttk.Scrollbar(tabla, orient="vertical", command=self._on_scroll)
+        self.scroll.grid(row=0, column=1, sticky="ns")
+        xscroll = ttk.Scrollbar(tabla, orient="horizontal", command=self.tree.xview)
+        xscroll.grid(row=1, column=0, sticky="we")
+        self.tree.configure(xscrollcommand=xscroll.set)
+        tabla.rowconfigure(0, weight=1)
+        tabla.columnconfigure(0, weight=1)
+
+        self.label_estado = ttk.Label(self, padding=(10, 6))
+        self.label_estado.pack(fill="x")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._mover(-3))
+        self.tree.bind("<Button-5>", lambda e: self._mover(3))
+        self.tree.bind("<Prior>", lambda e: self._mover(-self.filas_visibles))
+        self.tree.bind("<Next>", lambda e: self._mover(self.filas_visibles))
+        self.tree.bind("<Home>", lambda e: self._ir_a(0))
+        self.tree.bind("<End>", lambda e: self._ir_a(len(self.indices)))
+
+    def _on_resize(self, event):
+        filas = max(1, (event.height - ALTO_FILA) // ALTO_FILA)
+        if filas != self.filas_visibles:
+            self.filas_visibles = filas
+            self.tree.configure(height=filas)
+            self._refrescar()
+
+    def _on_wheel(self, event):
+        self._mover(-3 if event.delta > 0 else 3)
+
+    def _on_scroll(self, accion, valor, unidad=None):
+        if accion == "moveto":
+            self._ir_a(int(float(valor) * len(self.indices)))
+        elif accion == "scroll":
+            paso = self.filas_visibles if unidad == "pages" else 1
+            self._mover(int(valor) * paso)
+
+    def _mover(self, delta: int):
+        self._ir_a(self.offset + delta)
+        return "break"
+
+    def _ir_a(self, offset: int):
+        maximo = max(0, len(self.indices) - self.filas_visibles)
+        offset = min(max(0, offset), maximo)
+        if offset != self.offset:
+            self.offset = offset
+            self._refrescar()
+        return "break"
+
+    def _refrescar(self):
+        """Renderiza solo la ventana visible de filas."""
+        ventana = self.indices[self.offset:self.offset + self.filas_visibles]
+        filas = self.df.iloc[ventana].itertuples(index=False, name=None)
+
+        self.tree.delete(*self.tree.get_children())
+        for fila in filas:
+            self.tree.insert("", "end", values=[_formatear(v) for v in fila])
+
+        total = len(self.indices)
+        if total:
+            self.scroll.set(self.offset / total, min(1.0, (self.offset + len(ventana)) / total))
+        else:
+            self.scroll.set(0, 1)
+
+        desde = self.offset + 1 if total else 0
+        hasta = self.offset + len(ventana)
+        self.label_estado.configure(
+            text=f"Filas {desde}–{hasta} de {total} filtradas (total {self.n})"
+        )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# los módulos viven sueltos en src/ (sin paquete instalable)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
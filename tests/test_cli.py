@@ -0,0 +1,17 @@
+import json
+
+import conciliacion
+
+
+def test_out_con_extension_invalida_sale_antes_de_correr(tmp_path, monkeypatch, capsys):
+    def _no_deberia_correr(*args, **kwargs):
+        raise AssertionError("no debería leer el extracto")
+
+    monkeypatch.setattr(conciliacion, "ejecutar", _no_deberia_correr)
+    ruta = tmp_path / "extracto.xlsx"
+    ruta.write_bytes(b"")
+
+    codigo = conciliacion.main(["run", "--bank", "itau", "--file", str(ruta), "--out", str(tmp_path / "res.txt")])
+
+    assert codigo == conciliacion.SALIDA_USO
+    assert "no soportado" in json.loads(capsys.readouterr().out)["error"]
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+import conciliacion
+import historial
+
+
+@pytest.fixture
+def corrida(tmp_path, monkeypatch):
+    monkeypatch.setattr(historial, "RUTA_HISTORIAL", str(tmp_path / "historial.sqlite"))
+    ruta = tmp_path / "extracto.xlsx"
+    ruta.write_bytes(b"")  # ejecutar solo verifica que exista: el lector es un hook
+    extracto = pd.DataFrame({
+        "Fecha": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"]),
+        "Concepto": ["a", "b", "c"],
+        "Débito": [100.0, 0.0, 5.0],
+        "Crédito": [0.0, 250.0, 0.0],
+    })
+    mayor = pd.DataFrame({
+        "fec_doc": pd.to_datetime(["2024-01-02", "2024-01-03"]),
+        "imp_mov_mo": [-100.0, 250.0],
+        "nro_trans": [1, 2],
+    })
+
+    def _ejecutar():
+        return conciliacion.ejecutar(
+            "itau",
+            str(ruta),
+            leer_extracto=lambda b, r: extracto.copy(),
+            obtener_mayor=lambda cod_tit, al_leer_lote, **kw: mayor.copy(),
+        )
+
+    return _ejecutar
+
+
+def test_corrida_sin_exportar_no_esconde_lineas(corrida):
+    primera = corrida()
+    assert primera.df_comparacion["Encontrado"].sum() == 2
+    assert primera.historial_pendiente
+
+    # no se exportó ni confirmó: la siguiente corrida vuelve a ver todo
+    segunda = corrida()
+    assert segunda.omitidos_historial == 0
+    assert len(segunda.df_comparacion) == 3
+
+
+def test_corrida_confirmada_descarta_lo_conciliado(corrida):
+    primera = corrida()
+    assert conciliacion.confirmar(primera) == 3
+    assert not primera.historial_pendiente
+
+    segunda = corrida()
+    assert segunda.omitidos_historial == 2
+    assert len(segunda.df_comparacion) == 1
+
+
+def test_segunda_comparacion_usa_la_cache(corrida, monkeypatch):
+    import comparador
+
+    # historial activo: una corrida anterior ya exportada y confirmada
+    conciliacion.confirmar(corrida())
+    cache = comparador.CacheComparaciones()
+    ejecutar = conciliacion.ejecutar
+
+    def _con_cache(*args, **kwargs):
+        return ejecutar(*args, cache=cache, **kwargs)
+
+    monkeypatch.setattr(conciliacion, "ejecutar", _con_cache)
+    primera = corrida()
+    segunda = corrida()  # como un segundo "Comparar" en la GUI sin exportar
+
+    assert (cache.fallos, cache.aciertos) == (1, 1)
+    assert segunda.df_comparacion is primera.df_comparacion
@@ -0,0 +1,39 @@
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import exportador
+import instrumentacion
+
+
+@pytest.fixture
+def registros():
+    sumidero = instrumentacion.SumideroLista()
+    instrumentacion.configurar(sumidero, memoria=False)
+    yield sumidero.registros
+    instrumentacion.configurar(None)
+
+
+def test_exportacion_registra_filas_salida(registros, tmp_path):
+    df = pd.DataFrame({"Fecha": pd.to_datetime(["2024-01-02"] * 3), "Importe": [1.0, 2.0, 3.0]})
+    exportador.exportar(df, str(tmp_path / "a.csv"))
+    exportador.exportar(iter([df, df.head(2)]), str(tmp_path / "b.csv"))
+
+    exportaciones = [r for r in registros if r["etapa"] == "exportacion"]
+    assert [(r["filas_entrada"], r["filas_salida"]) for r in exportaciones] == [(3, 3), (5, 5)]
+
+
+def test_no_apaga_tracemalloc_ajeno():
+    tracemalloc.start()
+    try:
+        instrumentacion.configurar(instrumentacion.SumideroLista())
+        instrumentacion.configurar(None)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+    instrumentacion.configurar(instrumentacion.SumideroLista())
+    assert tracemalloc.is_tracing()
+    instrumentacion.configurar(None)
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import comparador
+import puntos_control
+
+
+@pytest.fixture(params=["parquet", "csv"])
+def formato(request, monkeypatch):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(puntos_control, "_hay_pyarrow", lambda: False)
+    return request.param
+
+
+def _resultado():
+    extracto = pd.DataFrame({
+        "Fecha": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-20"]),
+        "Concepto": pd.Series(["PAGO", "PAGO", "COMISION"], dtype="category"),
+        "Débito": [100.0, 0.0, 0.1 + 0.2],
+        "Crédito": [0.0, 250.0, 0.0],
+        "Saldo_OK": pd.array([True, None, False], dtype="boolean"),
+    })
+    mayor = pd.DataFrame({
+        "fec_doc": pd.to_datetime(["2024-01-02", "2024-01-15"]),
+        "imp_mov_mo": [-100.0, -0.5],
+        "nro_trans": [1, 2],
+    })
+    return comparador.comparar(extracto, mayor)
+
+
+def _casos():
+    resultado = _resultado()
+    varios = pd.DataFrame({
+        "entero": pd.array([1, None, 3], dtype="Int64"),
+        "texto": ["", None, 'x,"y"\nz'],
+        "flotante": [0.1, np.nan, 1e-300],
+        "logico": [True, False, True],
+    }, index=[5, 3, 9])
+    return {"comparacion": resultado, "subconjunto": resultado.iloc[1:], "vacio": resultado.iloc[0:0], "varios": varios}
+
+
+@pytest.mark.parametrize("caso", ["comparacion", "subconjunto", "vacio", "varios"])
+def test_ida_y_vuelta_conserva_la_huella(formato, caso):
+    df = _casos()[caso]
+    datos, usado, tipos = puntos_control._serializar(df)
+    assert usado == formato
+
+    recuperado = puntos_control._deserializar(datos, usado, tipos)
+
+    assert recuperado.dtypes.astype(str).to_dict() == df.dtypes.astype(str).to_dict()
+    assert comparador.huella_df(recuperado) == comparador.huella_df(df)
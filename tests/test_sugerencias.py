@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import comparador
+
+_SUGERENCIA = re.compile(r"\(Δ ([\d.]+), (\d+) d\)")
+
+
+def _extracto(fechas, montos):
+    montos = np.asarray(montos, dtype=float)
+    return pd.DataFrame({
+        "Fecha": pd.to_datetime(fechas),
+        "Concepto": [f"linea {i}" for i in range(len(montos))],
+        "Débito": np.where(montos < 0, -montos, 0.0),
+        "Crédito": np.where(montos >= 0, montos, 0.0),
+    })
+
+
+def _mayor(fechas, montos):
+    return pd.DataFrame({
+        "fec_doc": pd.to_datetime(fechas),
+        "imp_mov_mo": np.asarray(montos, dtype=float),
+        "nro_trans": np.arange(1, len(montos) + 1),
+    })
+
+
+def _distancias(texto):
+    """[(Δ centavos, días), ...] de una celda de Sugerencias."""
+    if texto is None or texto is pd.NA or (isinstance(texto, float) and np.isnan(texto)):
+        return []
+    return [(round(float(d) * 100), int(n)) for d, n in _SUGERENCIA.findall(texto)]
+
+
+def _fuerza_bruta(df_excel, df_bd, resultado, k):
+    """Ranking de referencia: todos los pares (línea pendiente, asiento libre)."""
+    usados = set(resultado.loc[resultado["Encontrado"], "nro_trans"].astype(int))
+    libres = df_bd[~df_bd["nro_trans"].isin(usados)]
+    cent_bd = np.round(libres["imp_mov_mo"].to_numpy() * 100).astype(np.int64)
+    dia_bd = libres["fec_doc"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    esperado = []
+    for _, fila in resultado.iterrows():
+        if fila["Encontrado"]:
+            esperado.append([])
+            continue
+        cent = round(fila["Monto_norm"] * 100)
+        dia = np.datetime64(fila["Fecha_norm"], "D").astype(np.int64)
+        mismo_signo = (cent_bd >= 0) == (cent >= 0)
+        pares = sorted(zip(np.abs(cent_bd[mismo_signo] - cent), np.abs(dia_bd[mismo_signo] - dia)))
+        esperado.append([(int(a), int(b)) for a, b in pares[:k]])
+    return esperado
+
+
+def test_monto_repetido_todos_los_meses():
+    fechas = [f"2024-{m:02d}-15" for m in range(1, 13)]
+    df_bd = _mayor(fechas, [-1000.0] * 12)
+    df_excel = _extracto(["2024-01-16"], [-1000.50])
+
+    resultado = comparador.comparar(df_excel, df_bd, k_sugerencias=3)
+
+    assert _distancias(resultado["Sugerencias"].iloc[0]) == [(50, 1), (50, 30), (50, 59)]
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_sugerencias_igual_que_fuerza_bruta(semilla):
+    rng = np.random.default_rng(semilla)
+    k = int(rng.integers(1, 5))
+    # pocos montos distintos y muchas fechas: grupos de montos repetidos
+    montos_base = rng.choice([-1, 1], 8) * rng.integers(1, 5000, 8) / 100
+    n_bd, n_ex = int(rng.integers(5, 60)), int(rng.integers(1, 30))
+    dias = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 400, n_bd + n_ex), unit="D")
+    montos = np.concatenate([
+        rng.choice(montos_base, n_bd),
+        rng.choice(montos_base, n_ex) + rng.choice([0, 0.01, -0.5, 3], n_ex),
+    ])
+    df_bd = _mayor(dias[:n_bd], montos[:n_bd])
+    df_excel = _extracto(dias[n_bd:], montos[n_bd:])
+
+    resultado = comparador.comparar(df_excel, df_bd, k_sugerencias=k)
+
+    obtenido = [_distancias(t) for t in resultado["Sugerencias"]]
+    assert obtenido == _fuerza_bruta(df_excel, df_bd, resultado, k)
+
+
+def test_no_sugiere_asientos_conciliados_por_el_historial():
+    df_bd = _mayor(["2024-01-15", "2024-02-15", "2024-03-15"], [-1000.0] * 3)
+    df_excel = _extracto(["2024-01-16"], [-1000.50])
+
+    resultado = comparador.comparar(df_excel, df_bd, k_sugerencias=3, nro_conciliados=("1",))
+
+    texto = resultado["Sugerencias"].iloc[0]
+    assert "nro 1 " not in texto
+    assert _distancias(texto) == [(50, 30), (50, 59)]
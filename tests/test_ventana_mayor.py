@@ -0,0 +1,46 @@
+import pandas as pd
+
+import conciliacion
+import db
+import puntos_control
+import servicio
+
+
+def _mayor_completo():
+    # asientos dentro, cerca y lejos de la ventana del extracto (enero 2024)
+    return pd.DataFrame({
+        "fec_doc": pd.to_datetime(["2023-06-01", "2023-12-20", "2024-01-10", "2024-02-20", "2024-09-01"]),
+        "imp_mov_mo": [-100.0, -100.0, -100.0, -100.0, -100.0],
+        "nro_trans": [1, 2, 3, 4, 5],
+    })
+
+
+def _obtener_df_bd(cod_tit, chunksize=None, al_leer_lote=None, desde=None, hasta=None, **kw):
+    df = _mayor_completo()
+    return servicio._recortar(df, desde, hasta)
+
+
+def test_misma_ventana_en_todas_las_corridas(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "obtener_df_bd", _obtener_df_bd)
+    extracto = pd.DataFrame({
+        "Fecha": pd.to_datetime(["2024-01-05", "2024-01-25"]),
+        "Concepto": ["a", "b"],
+        "Débito": [100.5, 100.0],
+        "Crédito": [0.0, 0.0],
+    })
+    monkeypatch.setattr(conciliacion, "leer_extracto_banco", lambda b, r: extracto.copy())
+    ruta = tmp_path / "extracto.xlsx"
+    ruta.write_bytes(b"x")
+
+    directa = conciliacion.ejecutar("itau", str(ruta), usar_historial=False)
+    reanudable, trabajo = puntos_control.ejecutar_reanudable(
+        "itau", str(ruta), raiz=str(tmp_path / "trabajos"), usar_historial=False
+    )
+    en_servicio = servicio.Servicio().comparar("itau", b"x", "extracto.xlsx", usar_historial=False)
+
+    desde, hasta = conciliacion.ventana_mayor(extracto)
+    assert (str(desde), str(hasta)) == ("2023-12-05", "2024-02-25")
+    assert sorted(directa.df_bd["nro_trans"]) == [2, 3, 4]
+    for otra in (reanudable, en_servicio):
+        assert sorted(otra.df_bd["nro_trans"]) == [2, 3, 4]
+        pd.testing.assert_series_equal(otra.df_comparacion["Sugerencias"], directa.df_comparacion["Sugerencias"])
@@ -0,0 +1,48 @@
+import openpyxl
+import pytest
+
+import vigilante
+
+
+def _escribir(ruta, filas):
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    for fila in filas:
+        hoja.append(fila)
+    libro.save(ruta)
+    return str(ruta)
+
+
+@pytest.fixture
+def extracto_itau(tmp_path):
+    # Itaú con "Descripción" (también es encabezado BROU) y sin pista en el nombre
+    return _escribir(tmp_path / "extracto.xlsx", [
+        ["Banco Itaú - Estado de cuenta"],
+        [],
+        ["Fecha", "Descripción", "Débito", "Crédito", "Saldo"],
+        ["02/01/2024", "PAGO PROVEEDOR", 100.0, None, 900.0],
+        ["03/01/2024", "TRANSFERENCIA RECIBIDA", None, 250.0, 1150.0],
+        ["Saldo actual", None, None, None, 1150.0],
+    ])
+
+
+@pytest.fixture
+def extracto_brou(tmp_path):
+    return _escribir(tmp_path / "movimientos.xlsx", [
+        ["BROU - Detalle de movimientos"],
+        ["Fecha", "Descripción", "Número de documento", "Asunto", "Dependencia", "Débito", "Crédito"],
+        ["02/01/2024", "PAGO PROVEEDOR", "123", "PAGO", "CASA CENTRAL", 100.0, None],
+        ["03/01/2024", "TRANSFERENCIA RECIBIDA", "124", "TRANSF", "CASA CENTRAL", None, 250.0],
+    ])
+
+
+def test_itau_sin_pista_en_el_nombre(extracto_itau):
+    banco, df = vigilante._leer_detectando(extracto_itau)
+    assert banco == "Itaú"
+    assert df["Saldo"].tolist() == [900.0, 1150.0]
+
+
+def test_brou_sin_pista_en_el_nombre(extracto_brou):
+    banco, df = vigilante._leer_detectando(extracto_brou)
+    assert banco == "BROU"
+    assert len(df) == 2